@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import Qt, QEvent, QT_VERSION_STR
+from PyQt6.QtGui import QImage, QKeyEvent
+
+import main
+
+BASELINEPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+TOLERANCE = 0.25  # slower than baseline by more than this fraction counts as a regression
+REPEATS = 3
+VIEWPORTSIZE = (1280, 720)
+PAINTSIZES = (1000, 10000, 100000)
+PYRAMIDSIZE = 9000  # past Qt's default 256 MB decode limit
+
+BENCHMARKS = []
+
+def benchmark(function):
+    BENCHMARKS.append(function)
+    return function
+
+def editor(app):
+    window = main.GameEditor()
+    window.resize(*VIEWPORTSIZE)
+    window.show()
+    app.processEvents()
+    return window
+
+def closeeditor(app, window):
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+
+def populate(window, count, assettype="Script"):
+    typecode = main.ASSETTYPES.index(assettype)
+    window.pasteassets([(typecode, f"bench{i}", "") for i in range(count)])
+    window.finishpaste()
+    window.bottom.clearSelection()
+    window.refresh.flush()
+
+def keypress(window, key, modifiers=Qt.KeyboardModifier.ControlModifier):
+    window.eventFilter(window.bottom, QKeyEvent(QEvent.Type.KeyPress, key, modifiers))
+
+def drain(app, window):
+    # chunked pastes and coalesced refreshes finish on later event loop passes
+    while window.pasting is not None:
+        app.processEvents()
+    window.refresh.flush()
+
+# Every benchmark returns {metric: seconds} for one run; setup stays outside the timed spans
+
+@benchmark
+def createasset(app, count=5000):
+    window = editor(app)
+    start = time.perf_counter()
+    for i in range(count):
+        window.createasset("Script", "Script")
+    drain(app, window)
+    elapsed = time.perf_counter() - start
+    closeeditor(app, window)
+    return {f"createasset_{count}": elapsed}
+
+@benchmark
+def deleteitem(app, count=100000):
+    window = editor(app)
+    populate(window, count)
+    rows = list(range(1, count + 1))  # everything but the root folder
+    start = time.perf_counter()
+    window.deleteitem(rows)
+    drain(app, window)
+    elapsed = time.perf_counter() - start
+    closeeditor(app, window)
+    return {f"deleteitem_{count}": elapsed}
+
+@benchmark
+def undoredo(app, depth=1000):
+    window = editor(app)
+    window.history.mergeseconds = 0  # one undo step per created asset
+    window.history.maxentries = depth
+    for i in range(depth):
+        window.createasset("Script", "Script")
+    drain(app, window)
+
+    start = time.perf_counter()
+    for i in range(depth):
+        window.undo()
+    drain(app, window)
+    undone = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(depth):
+        window.redo()
+    drain(app, window)
+    redone = time.perf_counter() - start
+    closeeditor(app, window)
+    return {f"undo_{depth}": undone, f"redo_{depth}": redone}
+
+@benchmark
+def copypaste(app, count=50000):
+    window = editor(app)
+    populate(window, count)
+    window.selectrows(1, count)
+
+    start = time.perf_counter()
+    keypress(window, Qt.Key.Key_C)
+    copied = time.perf_counter() - start
+
+    start = time.perf_counter()
+    keypress(window, Qt.Key.Key_V)
+    drain(app, window)
+    pasted = time.perf_counter() - start
+    closeeditor(app, window)
+    return {f"copy_{count}": copied, f"paste_{count}": pasted}
+
+@benchmark
+def propertiespanel(app, count=100000, passes=20):
+    window = editor(app)
+    populate(window, count)
+    window.selectrows(0, count)
+    window.refresh.flush()
+    start = time.perf_counter()
+    for i in range(passes):
+        window.updatepropertiespanel()
+    elapsed = (time.perf_counter() - start) / passes
+    closeeditor(app, window)
+    return {f"propertiespanel_{count}": elapsed}
+
+@benchmark
+def viewportpaint(app, passes=10):
+    results = {}
+    width, height = VIEWPORTSIZE
+    for count in PAINTSIZES:
+        viewport = main.Viewport()
+        viewport.resize(width, height)
+        viewport.show()
+        app.processEvents()
+        rng = random.Random(count)
+        for i in range(count):
+            layer = main.STATICLAYER if i % 2 else main.SPRITELAYER
+            viewport.addobject(rng.uniform(0, width), rng.uniform(0, height), rng.uniform(2, 12), rng.uniform(2, 12),
+                               rng.choice(("red", "green", "blue", "yellow", "white")), layer)
+        app.processEvents()
+
+        # cold rasterizes every static tile, warm blits them, both draw the sprites live
+        start = time.perf_counter()
+        for i in range(passes):
+            viewport.layers[main.STATICLAYER].clear()
+            viewport.repaint()
+        results[f"paint_{count}_cold"] = (time.perf_counter() - start) / passes
+
+        start = time.perf_counter()
+        for i in range(passes):
+            viewport.repaint()
+        results[f"paint_{count}_warm"] = (time.perf_counter() - start) / passes
+
+        viewport.close()
+        viewport.deleteLater()
+        app.processEvents()
+    return results
+
+def spawnentities(world, count, seed):
+    # moving, animated entities spread over twice the viewport in each direction
+    np = main.importnumpy()
+    rng = np.random.default_rng(seed)
+    width, height = VIEWPORTSIZE[0] * 2, VIEWPORTSIZE[1] * 2
+    world.bounds = (0, 0, width, height)
+    first = world.addflipbook(range(8))
+    return {
+        "transform": {"x": rng.uniform(0, width, count), "y": rng.uniform(0, height, count), "w": 6, "h": 6},
+        "velocity": {"vx": rng.normal(0, 80, count), "vy": rng.normal(0, 80, count)},
+        "animation": {"first": first, "frames": 8, "fps": rng.uniform(4, 16, count)},
+    }
+
+@benchmark
+def ecsstep(app, count=100000, passes=60):
+    world = main.World()
+    world.create(count, sprite={}, material={}, **spawnentities(world, count, count))
+    world.step(1 / main.TICKRATE)  # the first step builds the cached queries
+    start = time.perf_counter()
+    for i in range(passes):
+        world.step(1 / main.TICKRATE)
+    return {f"ecsstep_{count}": (time.perf_counter() - start) / passes}
+
+@benchmark
+def ecsframe(app, count=100000, passes=10):
+    # a quarter of the entities are on screen, the rest are culled
+    viewport = main.Viewport()
+    viewport.resize(*VIEWPORTSIZE)
+    viewport.show()
+    app.processEvents()
+    viewport.spawn(count, "#30a0ff", **spawnentities(viewport.world, count, count))
+    viewport.updatesimulation(1 / main.TICKRATE)
+    start = time.perf_counter()
+    for i in range(passes):
+        viewport.updatesimulation(1 / main.TICKRATE)
+        viewport.repaint()
+    elapsed = (time.perf_counter() - start) / passes
+    viewport.close()
+    viewport.deleteLater()
+    app.processEvents()
+    return {f"ecsframe_{count}": elapsed}
+
+@benchmark
+def imagepyramid(app, size=PYRAMIDSIZE):
+    # PNG only decodes whole, so this also checks that a big one still builds at all
+    folder = tempfile.mkdtemp()
+    try:
+        source = os.path.join(folder, "big.png")
+        image = QImage(size, size, QImage.Format.Format_RGB32)
+        image.fill(Qt.GlobalColor.darkCyan)
+        image.save(source)
+        del image
+        start = time.perf_counter()
+        pyramid = main.openpyramid(source, folder)
+        elapsed = time.perf_counter() - start
+        pyramid.close()
+    finally:
+        shutil.rmtree(folder)
+    return {f"pyramid_png_{size}": elapsed}
+
+def run(app, names, repeats):
+    runs = {}
+    for function in BENCHMARKS:
+        if names and function.__name__ not in names:
+            continue
+        for i in range(repeats):
+            for metric, seconds in function(app).items():
+                runs.setdefault(metric, []).append(seconds)
+        print(f"{function.__name__}: done", file=sys.stderr)
+    return {metric: {"seconds": min(values), "median": statistics.median(values), "runs": values}
+            for metric, values in runs.items()}
+
+def compare(results, baseline, tolerance):
+    # best run against best run, the least noisy figure either side has
+    regressions = []
+    for metric, result in sorted(results.items()):
+        before = baseline.get("results", {}).get(metric)
+        if before is None:
+            print(f"  {metric:<28}{result['seconds'] * 1000:10.2f} ms  (new)", file=sys.stderr)
+            continue
+        ratio = result["seconds"] / before["seconds"] if before["seconds"] else 1.0
+        result["baseline"] = before["seconds"]
+        result["ratio"] = ratio
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(metric)
+        print(f"  {metric:<28}{result['seconds'] * 1000:10.2f} ms  {before['seconds'] * 1000:10.2f} ms  x{ratio:.2f}{flag}", file=sys.stderr)
+    return regressions
+
+def runcli():
+    known = [function.__name__ for function in BENCHMARKS]
+    parser = argparse.ArgumentParser(description="Benchmark editor hot paths headlessly")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all by default: " + ", ".join(known))
+    parser.add_argument("--repeat", type=int, default=REPEATS)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", default=BASELINEPATH, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in known]
+    if unknown:
+        # a typo would otherwise measure nothing and still pass
+        parser.error(f"unknown benchmark(s) {', '.join(unknown)}; choose from {', '.join(known)}")
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = run(app, set(args.names), max(1, args.repeat))
+    report = {
+        "python": platform.python_version(),
+        "qt": QT_VERSION_STR,
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(text + "\n")
+        print(f"baseline saved to {args.baseline}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(runcli())
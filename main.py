@@ -1,65 +1,3970 @@
+import time
+STARTUPTIME = time.perf_counter()  # taken before the heavy imports so --profile-startup can report them
+
 import sys
 import os
+import math
+import queue
+import hashlib
+import threading
+import functools
+import select
+import struct
+import mmap
+import marshal
+import zlib
+import ctypes
+from array import array
+from collections import deque, OrderedDict
+from contextlib import contextmanager, nullcontext
+
+from PyQt6.QtWidgets import (
+    QApplication, QMainWindow, QTextEdit, QFrame, QSplitter, QSplitterHandle,
+    QLabel, QWidget, QMenu, QListView, QFileDialog, QPlainTextEdit
+)
+from PyQt6.QtCore import (
+    Qt, QSize, QTimer, QRect, QRectF, QPointF, QAbstractListModel, QModelIndex,
+    QItemSelection, QItemSelectionModel, pyqtSignal, QMimeData, QByteArray
+)
+from PyQt6.QtGui import (
+    QAction, QIcon, QIntValidator, QKeyEvent, QPainter, QColor, QPixmap, QImage, QImageReader, QImageIOHandler,
+    QRadialGradient, QBrush, QPen
+)
+from PyQt6 import sip
+from PyQt6.QtWidgets import QLineEdit, QVBoxLayout, QHBoxLayout, QComboBox, QFormLayout
+
+assetspath = 'assets'
+
+folderimgassetpath = os.path.join(assetspath, "FOLDER.png")
+scriptimgassetpath = os.path.join(assetspath, "SCRIPT.png")
+matimgassetpath = os.path.join(assetspath, "MATERIAL.png")
+audioimgassetpath = os.path.join(assetspath, "AUDIO.png")
+photoimgassetpath = os.path.join(assetspath, "IMAGE.png")
+
+ASSETTYPES = ["Folder", "Script", "Material", "Audio", "Image"]  # index is the stored type code
+ASSETICONPATHS = {
+    "Folder": folderimgassetpath,
+    "Script": scriptimgassetpath,
+    "Material": matimgassetpath,
+    "Audio": audioimgassetpath,
+    "Image": photoimgassetpath,
+}
+FILEASSETTYPES = ["Audio", "Image", "Script", "Material"]  # types that carry a file location in UserRole + 1
+THUMBNAILTYPES = ["Audio", "Image", "Material"]  # types that get a rendered preview instead of the type icon
+
+EXTENSIONTYPES = {
+    ".png": "Image", ".jpg": "Image", ".jpeg": "Image", ".bmp": "Image", ".gif": "Image", ".webp": "Image",
+    ".wav": "Audio", ".ogg": "Audio", ".mp3": "Audio", ".flac": "Audio",
+    ".py": "Script",
+    ".mat": "Material",
+}
+
+thumbcachepath = os.path.join(os.path.expanduser("~"), ".gameengine", "thumbnails")
+scriptcachepath = os.path.join(os.path.expanduser("~"), ".gameengine", "scripts")
+pyramidcachepath = os.path.join(os.path.expanduser("~"), ".gameengine", "pyramids")
+peakcachepath = os.path.join(os.path.expanduser("~"), ".gameengine", "peaks")
+
+ICONSIZE = 64
+MINICONSIZE = 1  # range accepted by the Project Settings icon size field
+MAXICONSIZE = 64
+THUMBSIZE = MAXICONSIZE
+THUMBWORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+THUMBPOLLMS = 30  # how often finished thumbnails are collected on the UI thread
+THUMBCACHELIMIT = 256 * 1024 * 1024  # bytes of thumbnails kept on disk
+THUMBMEMORYLIMIT = 4096  # decoded thumbnails kept in memory
+IMAGEPYRAMIDPIXELS = 16 * 1024 * 1024  # images bigger than this are read through a tiled pyramid
+IMAGEBANDBYTES = 64 * 1024 * 1024  # decoded source rows held at once while a pyramid is built
+IMAGEDECODELIMIT = 2048  # megabytes a whole-image decode may take, for formats that can't be read in bands
+IMAGEVIEWTILES = 256  # decoded tiles an image view keeps
+PYRAMIDEXTENSION = ".pyr"
+PYRAMIDMAGIC = b"GEMP"
+PYRAMIDVERSION = 1
+PYRAMIDTILESIZE = 256
+PYRAMIDCACHELIMIT = 4 * 1024 * 1024 * 1024  # bytes of pyramids kept on disk
+PYRAMIDHEADER = struct.Struct("<4sHHIIH")  # magic, version, tile size, width, height, levels
+PYRAMIDLEVEL = struct.Struct("<IIII")  # width, height, columns, rows
+PYRAMIDTILE = struct.Struct("<QI")  # offset, length of a zlib-compressed ARGB32 premultiplied tile
+SCRIPTWORKERS = max(1, min(2, (os.cpu_count() or 2) - 1))
+SCRIPTTIMEOUTSECONDS = 10.0  # a run still going after this long gets its worker killed
+SCRIPTPOLLMS = 30
+SCRIPTOUTPUTLIMIT = 64 * 1024  # trailing characters of a run's output sent back to the editor
+CONSOLELINES = 5000
+WAVECHUNKFRAMES = 65536  # frames converted at once while audio is streamed from its mapping
+WAVEPCM = 1
+WAVEFLOAT = 3
+WAVEEXTENSIBLE = 0xFFFE  # the real format code is the first two bytes of the subformat GUID
+WAVESAMPLETYPES = {(WAVEPCM, 1): "u1", (WAVEPCM, 2): "<i2", (WAVEPCM, 3): None, (WAVEPCM, 4): "<i4",
+                   (WAVEFLOAT, 4): "<f4", (WAVEFLOAT, 8): "<f8"}  # (format, bytes per sample) -> dtype, None is 24 bit
+PEAKEXTENSION = ".peaks"
+PEAKMAGIC = b"GEPK"
+PEAKVERSION = 1
+PEAKBLOCKFRAMES = 256  # frames behind each min/max pair of the finest peak level
+PEAKCACHELIMIT = 1024 * 1024 * 1024  # bytes of peak pyramids kept on disk
+PEAKHEADER = struct.Struct("<4sHHIIQH")  # magic, version, channels, sample rate, block frames, frames, levels
+PEAKLEVEL = struct.Struct("<QQ")  # offset, count of int16 (min, max) pairs
+WAVEFORMCOLOR = "#4fc36e"
+WAVEFORMBACKGROUND = "#202020"
+MATERIALSWATCHCOLOR = "#808080"  # materials without a .mat file
+MATERIALSLOTS = 65536  # materials an ObjectStore holds at once, its material column is uint16
+UNDOMAXENTRIES = 1000
+UNDOMAXBYTES = 32 * 1024 * 1024
+UNDOMERGESECONDS = 1.0  # repeats of the same edit closer than this become one undo step
+UNDOCOMMANDBYTES = 120  # rough per-entry and per-record overheads used for the byte limit
+UNDORECORDBYTES = 100
+BULKRESETRUNS = 64  # above this many row runs, bulk edits rebuild the listing under one model reset
+ASSETIDSMIMETYPE = "application/x-gameengine-assetids"
+ASSETSMIMETYPE = "application/x-gameengine-assets"  # serialized assets on the system clipboard
+CLIPBOARDMAGIC = b"GEAC"
+CLIPBOARDVERSION = 1
+PASTECHUNKSIZE = 10000  # pastes bigger than this are inserted a chunk per event loop pass
+PROJECTEXTENSION = ".geproj"
+PROJECTMAGIC = b"GEPR"
+PROJECTVERSION = 3
+PROJECTHEADER = struct.Struct("<4sHHIIIIQQQQ")  # magic, version, flags, journal generation, id limit, records, folders, then section offsets
+PROJECTFOLDER = struct.Struct("<iII")  # folder id, first record, record count
+PROJECTRECORD = struct.Struct("<iiB3xIIIi")  # id, parent, type, name offset/length, fileloc offset/length
+ROOTFOLDER = -1  # parent of top level assets
+FOLDERTYPECODE = ASSETTYPES.index("Folder")
+SCRIPTTYPECODE = ASSETTYPES.index("Script")
+JOURNALEXTENSION = ".journal"
+JOURNALMAGIC = b"GEJN"
+JOURNALHEADER = struct.Struct("<4sI")  # magic, generation of the snapshot it applies to
+JOURNALFRAME = struct.Struct("<II")  # payload length, crc32, then the marshalled change
+JOURNALCOMPACTBYTES = 4 * 1024 * 1024  # the writer folds the journal into the snapshot past this size
+JOURNALIDLESECONDS = 30.0  # or after this long without edits
+REFRESHFRAMEMS = 16  # panels refresh at most once per frame however many signals mark them dirty
+SCANBATCHSIZE = 1000  # paths per event handed from the scanner to the UI
+SCANAPPLYMS = 8  # UI time per tick spent applying scanner events
+INDEXIDLEMS = 8  # UI time per idle tick spent indexing asset names for search
+INDEXCHUNKSIZE = 256  # names indexed between deadline checks
+SCANPOLLMS = 30
+SCANPOLLSECONDS = 2.0  # directory mtime check interval when inotify is unavailable
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFYMASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+GRIDCELLSIZE = 128
+ENTITYCAPACITY = 1024  # component rows allocated by the first add, doubled as needed
+COMPONENTS = {  # component -> (column, numpy dtype, default) per column
+    "transform": (("x", "f4", 0), ("y", "f4", 0), ("w", "f4", 1), ("h", "f4", 1), ("prevx", "f4", 0), ("prevy", "f4", 0)),
+    "velocity": (("vx", "f4", 0), ("vy", "f4", 0)),
+    "sprite": (("sprite", "i4", -1),),  # atlas sprite index
+    "material": (("material", "u2", 0),),  # index into the viewport ObjectStore's materials
+    "animation": (("first", "i4", 0), ("frames", "i4", 1), ("fps", "f4", 12), ("time", "f4", 0)),
+}
+TICKRATE = 60  # simulation steps per second in play mode
+MAXCATCHUPSTEPS = 5
+FRAMESTATSWINDOW = 240
+TILESIZE = 256
+TILECACHELIMIT = 256  # tiles kept per retained layer
+STATICLAYER = 0  # rasterized once into cached tiles
+SPRITELAYER = 1  # drawn live every frame
+ATLASPAGESIZE = 2048
+ATLASPADDING = 1  # transparent pixels between packed images, so filtering never bleeds
+ATLASMAXSPRITE = 512  # images are scaled down to fit this before they are packed
+TRACEEVENTLIMIT = 1000000  # newest scoped timings kept for trace export while profiling
+OVERLAYMS = 250  # performance overlay redraw interval
+STARTUPBUDGETMS = 500  # launch to first painted frame, --profile-startup fails past this
+
+np = None  # numpy, loaded on first use since importing it costs more than the rest of startup
+
+def importnumpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+class SpatialGrid:
+    def __init__(self, cellsize=GRIDCELLSIZE):
+        self.cellsize = cellsize
+        self.cells = {}  # (cx, cy) -> set of keys
+
+    def cellrange(self, x, y, w, h):
+        cs = self.cellsize
+        return int(x // cs), int(y // cs), int((x + max(w, 0)) // cs), int((y + max(h, 0)) // cs)
+
+    def insert(self, key, x, y, w, h):
+        x0, y0, x1, y1 = self.cellrange(x, y, w, h)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self.cells.setdefault((cx, cy), set()).add(key)
+
+    def remove(self, key, x, y, w, h):
+        x0, y0, x1, y1 = self.cellrange(x, y, w, h)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is not None:
+                    cell.discard(key)
+                    if not cell:
+                        del self.cells[(cx, cy)]
+
+    def move(self, key, old, new):
+        if self.cellrange(*old) == self.cellrange(*new):
+            return  # same cells, nothing to relink
+        self.remove(key, *old)
+        self.insert(key, *new)
+
+    def query(self, x, y, w, h):
+        # coarse: everything in the touched cells, callers refine against real bounds
+        found = set()
+        x0, y0, x1, y1 = self.cellrange(x, y, w, h)
+        cells = self.cells
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(cells):
+            # rect covers more cells than are occupied, walk the occupied ones instead
+            candidates = [cell for (cx, cy), cell in cells.items() if x0 <= cx <= x1 and y0 <= cy <= y1]
+        else:
+            candidates = [cells[c] for c in ((cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)) if c in cells]
+        for cell in candidates:
+            found.update(cell)
+        return found
+
+MATERIALBLENDMODES = {
+    "normal": QPainter.CompositionMode.CompositionMode_SourceOver,
+    "multiply": QPainter.CompositionMode.CompositionMode_Multiply,
+    "screen": QPainter.CompositionMode.CompositionMode_Screen,
+    "add": QPainter.CompositionMode.CompositionMode_Plus,
+    "darken": QPainter.CompositionMode.CompositionMode_Darken,
+    "lighten": QPainter.CompositionMode.CompositionMode_Lighten,
+    "overlay": QPainter.CompositionMode.CompositionMode_Overlay,
+}
+
+class Material:
+    # How viewport objects are filled, outlined and blended, compiled once into the
+    # brush, pen and composition mode the painter is switched to
+    __slots__ = ('color', 'outline', 'outlinewidth', 'opacity', 'blend', 'brush', 'pen', 'mode')
+
+    def __init__(self, color=MATERIALSWATCHCOLOR, outline="#000000", outlinewidth=1.0, opacity=1.0, blend="normal"):
+        self.configure(color, outline, outlinewidth, opacity, blend)
+
+    def configure(self, color, outline, outlinewidth, opacity, blend):
+        self.color = color
+        self.outline = outline
+        self.outlinewidth = outlinewidth
+        self.opacity = min(1.0, max(0.0, opacity))
+        self.blend = blend if blend in MATERIALBLENDMODES else "normal"
+        self.brush = QBrush(QColor(color))
+        if outline and outlinewidth > 0:
+            self.pen = QPen(QColor(outline), outlinewidth)
+        else:
+            self.pen = QPen(Qt.PenStyle.NoPen)
+        self.mode = MATERIALBLENDMODES[self.blend]
+
+    def properties(self):
+        return self.color, self.outline, self.outlinewidth, self.opacity, self.blend
+
+    def apply(self, painter, previous=None):
+        # only what differs from the material drawn before
+        if previous is None or previous.brush != self.brush:
+            painter.setBrush(self.brush)
+        if previous is None or previous.pen != self.pen:
+            painter.setPen(self.pen)
+        if previous is None or previous.opacity != self.opacity:
+            painter.setOpacity(self.opacity)
+        if previous is None or previous.mode != self.mode:
+            painter.setCompositionMode(self.mode)
+
+def readmaterial(path):
+    # .mat files are "key = value" lines: color, outline, outlinewidth, opacity, blend
+    properties = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            key, separator, value = line.partition("=")
+            if separator:
+                properties[key.strip().lower()] = value.strip()
+    outline = properties.get("outline", "#000000")
+    return Material(
+        properties.get("color", MATERIALSWATCHCOLOR),
+        None if outline.lower() == "none" else outline,
+        float(properties.get("outlinewidth", 1.0)),
+        float(properties.get("opacity", 1.0)),
+        properties.get("blend", "normal").lower(),
+    )
+
+class MaterialLibrary:
+    # One Material per .mat file, reloaded in place when the file changes so everything
+    # drawn with it picks the change up
+    def __init__(self):
+        self.materials = {}  # path -> (mtime_ns, Material)
+        self.default = Material()
+
+    def get(self, path):
+        stat = os.stat(path)
+        entry = self.materials.get(path)
+        if entry is not None and entry[0] == stat.st_mtime_ns:
+            return entry[1]
+        material = readmaterial(path)
+        if entry is not None:
+            entry[1].configure(*material.properties())
+            material = entry[1]
+        self.materials[path] = (stat.st_mtime_ns, material)
+        return material
+
+    def reload(self, path):
+        # True when a material in use came back different
+        entry = self.materials.get(path)
+        if entry is None:
+            return False
+        before = entry[1].properties()
+        try:
+            return self.get(path).properties() != before
+        except (OSError, ValueError):
+            return False
+
+class ObjectStore:
+    # Struct-of-arrays storage for viewport drawables, a slot is the object's handle
+    def __init__(self, capacity=1024):
+        self.capacity = capacity  # columns are allocated by the first add, which is also when numpy gets imported
+        self.x = self.y = self.w = self.h = self.prevx = self.prevy = None
+        self.material = self.sprite = self.layer = self.alive = None
+        self.materials = []  # None where a slot was given back
+        self.materialrefs = []  # objects using each material slot
+        self.materialindex = {}  # id of a Material -> index into self.materials
+        self.colormaterials = {}  # rgba -> Material, for objects given a plain color
+        self.freematerials = []
+        self.free = []
+        self.size = 0  # slots in use, including freed ones
+
+    def __len__(self):
+        return self.size - len(self.free)
+
+    def grow(self, needed):
+        importnumpy()
+        if self.x is None:
+            capacity = self.capacity
+            for name in ('x', 'y', 'w', 'h', 'prevx', 'prevy'):
+                setattr(self, name, np.zeros(capacity, np.float32))
+            self.material = np.zeros(capacity, np.uint16)  # index into self.materials
+            self.sprite = np.full(capacity, -1, np.int32)  # atlas sprite index, -1 for a plain rect
+            self.layer = np.zeros(capacity, np.uint8)
+            self.alive = np.zeros(capacity, np.bool_)
+        capacity = len(self.x)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('x', 'y', 'w', 'h', 'prevx', 'prevy', 'material', 'sprite', 'layer', 'alive'):
+            old = getattr(self, name)
+            column = np.full(capacity, -1, old.dtype) if name == 'sprite' else np.zeros(capacity, old.dtype)
+            column[:len(old)] = old
+            setattr(self, name, column)
+
+    def materialslot(self, material):
+        # the material's index, taking a reference the caller gives back with releasematerial
+        if not isinstance(material, Material):
+            color = QColor(material)
+            rgba = color.rgba()
+            material = self.colormaterials.get(rgba)
+            if material is None:
+                material = self.colormaterials[rgba] = Material(color)
+        index = self.materialindex.get(id(material))
+        if index is None:
+            if self.freematerials:
+                index = self.freematerials.pop()
+                self.materials[index] = material
+            elif len(self.materials) < MATERIALSLOTS:
+                index = len(self.materials)
+                self.materials.append(material)
+                self.materialrefs.append(0)
+            else:
+                raise ValueError(f"more than {MATERIALSLOTS} materials in use at once")
+            self.materialindex[id(material)] = index  # kept alive in self.materials, so its id stays unique
+        self.materialrefs[index] += 1
+        return index
+
+    def retainmaterial(self, index, count=1):
+        self.materialrefs[index] += count
+
+    def releasematerial(self, index, count=1):
+        self.materialrefs[index] -= count
+        if self.materialrefs[index]:
+            return
+        material = self.materials[index]
+        del self.materialindex[id(material)]
+        rgba = QColor(material.color).rgba()
+        if self.colormaterials.get(rgba) is material:
+            del self.colormaterials[rgba]
+        self.materials[index] = None
+        self.freematerials.append(index)
+
+    def add(self, x, y, w, h, material, layer=0, sprite=-1):
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = self.size
+            self.grow(slot + 1)
+            self.size += 1
+        self.x[slot], self.y[slot], self.w[slot], self.h[slot] = x, y, w, h
+        self.prevx[slot], self.prevy[slot] = x, y
+        self.material[slot] = self.materialslot(material)
+        self.sprite[slot] = sprite
+        self.layer[slot] = layer
+        self.alive[slot] = True
+        return slot
+
+    def remove(self, slot):
+        if not self.alive[slot]:
+            raise KeyError(slot)
+        self.alive[slot] = False
+        self.releasematerial(int(self.material[slot]))
+        self.free.append(slot)
+
+    def update(self, slot, x=None, y=None, w=None, h=None, material=None):
+        if not self.alive[slot]:
+            raise KeyError(slot)
+        if x is not None:
+            self.x[slot] = x
+        if y is not None:
+            self.y[slot] = y
+        if w is not None:
+            self.w[slot] = w
+        if h is not None:
+            self.h[slot] = h
+        if material is not None:
+            index = self.materialslot(material)
+            self.releasematerial(int(self.material[slot]))
+            self.material[slot] = index
+
+    def snapshot(self):
+        if not self.size:
+            return
+        np.copyto(self.prevx[:self.size], self.x[:self.size])
+        np.copyto(self.prevy[:self.size], self.y[:self.size])
+
+    def bounds(self, slot):
+        return float(self.x[slot]), float(self.y[slot]), float(self.w[slot]), float(self.h[slot])
+
+    def intersecting(self, slots, x, y, w, h):
+        slots = slots[self.alive[slots]]
+        sx, sy = self.x[slots], self.y[slots]
+        mask = (sx < x + w) & (sx + self.w[slots] > x) & (sy < y + h) & (sy + self.h[slots] > y)
+        return slots[mask]
+
+class Profiler:
+    # Scoped timers kept as Chrome trace complete events. Off by default, and then a scope
+    # costs one flag check.
+    def __init__(self, limit=TRACEEVENTLIMIT):
+        self.enabled = False
+        self.events = deque(maxlen=limit)  # (name, start, seconds, thread id)
+        self.origin = time.perf_counter()
+
+    def start(self):
+        self.events.clear()
+        self.origin = time.perf_counter()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def add(self, name, start, end):
+        self.events.append((name, start, end - start, threading.get_ident()))
+
+    def scope(self, name):
+        return ProfileScope(self, name) if self.enabled else NULLSCOPE
+
+    def traceevents(self):
+        pid = os.getpid()
+        events = []
+        for thread in threading.enumerate():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread.ident, "args": {"name": thread.name}})
+        for name, start, seconds, tid in list(self.events):
+            events.append({"name": name, "cat": "editor", "ph": "X", "pid": pid, "tid": tid,
+                           "ts": round((start - self.origin) * 1e6, 3), "dur": round(seconds * 1e6, 3)})
+        return events
+
+    def export(self, path):
+        import json
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": self.traceevents(), "displayTimeUnit": "ms"}, f)
+
+class ProfileScope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start, time.perf_counter())
+
+NULLSCOPE = nullcontext()
+PROFILER = Profiler()
+
+def profiled(name):
+    def decorate(function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            if not PROFILER.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                PROFILER.add(name, start, time.perf_counter())
+        return timed
+    return decorate
+
+def percentiles(values, ranks=(50, 95, 99)):
+    ordered = sorted(values)
+    if not ordered:
+        return [0.0 for rank in ranks]
+    return [ordered[min(len(ordered) - 1, len(ordered) * rank // 100)] for rank in ranks]
+
+class FrameStats:
+    def __init__(self, window=FRAMESTATSWINDOW):
+        self.updatems = deque(maxlen=window)
+        self.renderms = deque(maxlen=window)
+        self.framems = deque(maxlen=window)
+        self.steps = 0
+        self.droppedsteps = 0
+        self.frames = 0
+
+    def record(self, updatems, renderms, framems, steps, dropped):
+        self.updatems.append(updatems)
+        self.renderms.append(renderms)
+        self.framems.append(framems)
+        self.steps += steps
+        self.droppedsteps += dropped
+        self.frames += 1
+
+    def summary(self):
+        def avg(values):
+            return sum(values) / len(values) if values else 0.0
+        return {
+            'frames': self.frames,
+            'steps': self.steps,
+            'droppedsteps': self.droppedsteps,
+            'updatems': avg(self.updatems),
+            'renderms': avg(self.renderms),
+            'framems': avg(self.framems),
+            'fps': 1000.0 / avg(self.framems) if self.framems and avg(self.framems) > 0 else 0.0,
+        }
+
+class FrameLoop:
+    # Fixed-timestep loop: the simulation always advances in steps of 1 / tickrate,
+    # rendering happens once per wakeup and interpolates between the last two steps.
+    def __init__(self, update, render, tickrate=TICKRATE, maxsteps=MAXCATCHUPSTEPS):
+        self.update = update
+        self.render = render
+        self.step = 1.0 / tickrate
+        self.maxsteps = maxsteps
+        self.accumulator = 0.0
+        self.last = 0.0
+        self.running = False
+        self.stats = FrameStats()
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.accumulator = 0.0
+        self.last = time.perf_counter()
+        self.stats = FrameStats()
+        self.timer.start(0)
+
+    def stop(self):
+        self.running = False
+        self.timer.stop()
+
+    def tick(self):
+        if not self.running:
+            return
+        now = time.perf_counter()
+        frametime = now - self.last
+        self.last = now
+        self.accumulator += frametime
+
+        steps = 0
+        while self.accumulator >= self.step and steps < self.maxsteps:
+            self.update(self.step)
+            self.accumulator -= self.step
+            steps += 1
+
+        # Fell too far behind, drop the backlog instead of spiralling
+        dropped = 0
+        if self.accumulator >= self.step:
+            dropped = int(self.accumulator // self.step)
+            self.accumulator -= dropped * self.step
+        updated = time.perf_counter()
+
+        self.render(self.accumulator / self.step)
+        rendered = time.perf_counter()
+
+        self.stats.record((updated - now) * 1000, (rendered - updated) * 1000, frametime * 1000, steps, dropped)
+
+        # Sleep until the next step is due, measured from now rather than a fixed interval
+        if self.running:
+            wait = self.step - self.accumulator - (time.perf_counter() - now)
+            self.timer.start(max(0, math.ceil(wait * 1000)))
+
+class TileCache:
+    # Rasterized tiles of one retained layer, dropped when an object inside them changes
+    def __init__(self, tilesize=TILESIZE, limit=TILECACHELIMIT):
+        self.tilesize = tilesize
+        self.limit = limit
+        self.tiles = OrderedDict()  # (tx, ty) -> QPixmap, or None for an empty tile
+
+    def tilesin(self, rect):
+        ts = self.tilesize
+        for ty in range(rect.top() // ts, rect.bottom() // ts + 1):
+            for tx in range(rect.left() // ts, rect.right() // ts + 1):
+                yield tx, ty
+
+    def invalidate(self, rect):
+        for key in self.tilesin(rect):
+            self.tiles.pop(key, None)
+
+    def clear(self):
+        self.tiles.clear()
+
+    def get(self, tx, ty, rasterize):
+        key = (tx, ty)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+        pixmap = rasterize(tx, ty)
+        self.tiles[key] = pixmap
+        while len(self.tiles) > self.limit:
+            self.tiles.popitem(last=False)
+        return pixmap
+
+class SkylinePacker:
+    # Bottom-left skyline packing: the top edge of what is placed so far is kept as
+    # (x, y, width) segments and each rectangle goes where its top ends lowest
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.skyline = [(0, 0, width)]
+        self.used = 0
+
+    def fit(self, index, w, h):
+        x = self.skyline[index][0]
+        if x + w > self.width:
+            return None
+        top = 0
+        remaining = w
+        while remaining > 0:
+            if index == len(self.skyline):
+                return None
+            top = max(top, self.skyline[index][1])
+            if top + h > self.height:
+                return None
+            remaining -= self.skyline[index][2]
+            index += 1
+        return top
+
+    def insert(self, w, h):
+        best = None
+        for index, (x, _, width) in enumerate(self.skyline):
+            y = self.fit(index, w, h)
+            if y is not None and (best is None or (y + h, width) < best[0]):
+                best = ((y + h, width), index, x, y)
+        if best is None:
+            return None
+        _, index, x, y = best
+        self.place(index, x, y, w, h)
+        self.used += w * h
+        return x, y
+
+    def place(self, index, x, y, w, h):
+        skyline = self.skyline
+        skyline.insert(index, (x, y + h, w))
+        # segments now under the new one are trimmed or dropped
+        end = x + w
+        i = index + 1
+        while i < len(skyline) and skyline[i][0] < end:
+            sx, sy, sw = skyline[i]
+            if sx + sw <= end:
+                del skyline[i]
+                continue
+            skyline[i] = (end, sy, sx + sw - end)
+            break
+        i = 0
+        while i + 1 < len(skyline):
+            if skyline[i][1] == skyline[i + 1][1]:
+                skyline[i] = (skyline[i][0], skyline[i][1], skyline[i][2] + skyline[i + 1][2])
+                del skyline[i + 1]
+            else:
+                i += 1
+
+class AtlasPage:
+    __slots__ = ('packer', 'image', 'pixmap', 'members')
+
+    def __init__(self, size):
+        self.packer = SkylinePacker(size, size)
+        self.image = QImage(size, size, QImage.Format.Format_ARGB32_Premultiplied)
+        self.image.fill(Qt.GlobalColor.transparent)
+        self.pixmap = None  # uploaded on first draw after a change
+        self.members = []  # sprite indices packed here
+
+class TextureAtlas:
+    # Packs images into shared pages so sprites cost one texture per page instead of one per
+    # file. A sprite index is stable; its page and source rect live in the lookup tables.
+    def __init__(self, pagesize=ATLASPAGESIZE, padding=ATLASPADDING, maxsprite=ATLASMAXSPRITE):
+        self.pagesize = pagesize
+        self.padding = padding
+        self.maxsprite = maxsprite
+        self.pages = []
+        self.paths = []  # sprite index -> source path
+        self.stamps = []  # sprite index -> (mtime_ns, size) the pixels came from
+        self.pageof = array('i')  # sprite index -> page
+        self.rects = array('f')  # sprite index * 4 -> x, y, w, h in pixels on its page
+        self.index = {}  # path -> sprite index
+        self.tablecache = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, path):
+        return path in self.index
+
+    @staticmethod
+    def stamp(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self, path):
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if size.isValid() and (size.width() > self.maxsprite or size.height() > self.maxsprite):
+            reader.setScaledSize(size.scaled(self.maxsprite, self.maxsprite, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            raise ValueError(f"{path}: {reader.errorString()}")
+        if image.width() > self.maxsprite or image.height() > self.maxsprite:
+            image = image.scaled(self.maxsprite, self.maxsprite, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        return image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+
+    def sprite(self, path):
+        # the sprite index for path, loading and packing the file the first time
+        index = self.index.get(path)
+        if index is not None:
+            return index
+        stamp = self.stamp(path)
+        image = self.load(path)
+        index = len(self.paths)
+        self.paths.append(path)
+        self.stamps.append(stamp)
+        self.pageof.append(-1)
+        self.rects.extend((0.0, 0.0, 0.0, 0.0))
+        self.index[path] = index
+        self.pack(index, image)
+        return index
+
+    def pack(self, index, image, pages=None):
+        padded = (image.width() + self.padding, image.height() + self.padding)
+        for page in (pages if pages is not None else range(len(self.pages))):
+            position = self.pages[page].packer.insert(*padded)
+            if position is not None:
+                break
+        else:
+            page = len(self.pages)
+            self.pages.append(AtlasPage(max(self.pagesize, *padded)))
+            position = self.pages[page].packer.insert(*padded)
+        self.draw(page, index, image, *position)
+
+    def draw(self, page, index, image, x, y):
+        atlaspage = self.pages[page]
+        painter = QPainter(atlaspage.image)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+        painter.drawImage(x, y, image)
+        painter.end()
+        atlaspage.pixmap = None
+        atlaspage.members.append(index)
+        self.pageof[index] = page
+        self.rects[index * 4:index * 4 + 4] = array('f', (x, y, image.width(), image.height()))
+        self.tablecache = None
+
+    def refresh(self, path):
+        # re-reads a member whose file changed; True when any page was touched
+        index = self.index.get(path)
+        if index is None:
+            return False
+        try:
+            stamp = self.stamp(path)
+            if stamp == self.stamps[index]:
+                return False
+            image = self.load(path)
+        except (OSError, ValueError):
+            return False
+        self.stamps[index] = stamp
+        page = self.pageof[index]
+        x, y, w, h = self.rects[index * 4:index * 4 + 4]
+        if (image.width(), image.height()) == (w, h):
+            # same size: overwrite in place, only this page is uploaded again
+            self.pages[page].members.remove(index)
+            self.draw(page, index, image, int(x), int(y))
+        else:
+            self.rebuildpage(page, {index: image})
+        return True
+
+    def rebuildpage(self, page, replaced):
+        # repacks one page; members keep their pixels unless replaced, what no longer fits moves on
+        old = self.pages[page]
+        images = {}
+        for index in old.members:
+            if index in replaced:
+                images[index] = replaced[index]
+            else:
+                x, y, w, h = (int(value) for value in self.rects[index * 4:index * 4 + 4])
+                images[index] = old.image.copy(x, y, w, h)
+        self.pages[page] = AtlasPage(self.pagesize)
+        overflow = []
+        for index, image in sorted(images.items(), key=lambda item: -item[1].height()):
+            position = self.pages[page].packer.insert(image.width() + self.padding, image.height() + self.padding)
+            if position is None:
+                overflow.append((index, image))
+            else:
+                self.draw(page, index, image, *position)
+        for index, image in overflow:
+            self.pack(index, image, [other for other in range(len(self.pages)) if other != page])
+
+    def pixmap(self, page):
+        atlaspage = self.pages[page]
+        if atlaspage.pixmap is None:
+            atlaspage.pixmap = QPixmap.fromImage(atlaspage.image)
+        return atlaspage.pixmap
+
+    def tables(self):
+        # (page per sprite, x y w h per sprite) as arrays for vectorized lookups
+        if self.tablecache is None:
+            importnumpy()
+            self.tablecache = (np.frombuffer(self.pageof, np.int32).copy(), np.frombuffer(self.rects, np.float32).reshape(-1, 4).copy())
+        return self.tablecache
+
+    def uv(self, index):
+        x, y, w, h = self.rects[index * 4:index * 4 + 4]
+        size = self.pages[self.pageof[index]].image.width()
+        return self.pageof[index], x / size, y / size, (x + w) / size, (y + h) / size
+
+class ComponentStore:
+    # One component as a sparse set: every column is dense over the entities that have the
+    # component, sparse maps an entity id to its dense row or -1. Removal moves the last rows
+    # into the holes, so the columns never have gaps.
+    def __init__(self, name, columns):
+        self.name = name
+        self.spec = columns  # (column, dtype, default)
+        self.columns = {}  # allocated by the first add, like ObjectStore
+        self.sparse = None
+        self.entities = None  # dense row -> entity id
+        self.size = 0
+        self.version = 0  # bumped whenever the set of entities or their rows change
+        self.onadd = None  # called with (store, dense rows) once rows have their values
+        self.onremove = None  # called with (store, dense rows) before rows lose their values
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, column):
+        # a view of the live rows; systems update it in place
+        return self.columns[column][:self.size]
+
+    def grow(self, entities, rows):
+        importnumpy()
+        if self.sparse is None:
+            self.sparse = np.full(entities, -1, np.int32)
+            self.entities = np.zeros(ENTITYCAPACITY, np.int32)
+            for column, dtype, default in self.spec:
+                self.columns[column] = np.full(ENTITYCAPACITY, default, dtype)
+        if entities > len(self.sparse):
+            sparse = np.full(entities, -1, np.int32)
+            sparse[:len(self.sparse)] = self.sparse
+            self.sparse = sparse
+        capacity = len(self.entities)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        entityrows = np.zeros(capacity, np.int32)
+        entityrows[:self.size] = self.entities[:self.size]
+        self.entities = entityrows
+        for column, dtype, default in self.spec:
+            data = np.full(capacity, default, dtype)
+            data[:self.size] = self.columns[column][:self.size]
+            self.columns[column] = data
+
+    def rows(self, entities):
+        # dense rows of entities, -1 for those without the component
+        if self.sparse is None:
+            return np.full(len(entities), -1, np.int32)
+        if len(entities) and entities.max() >= len(self.sparse):
+            rows = np.full(len(entities), -1, np.int32)
+            inside = entities < len(self.sparse)
+            rows[inside] = self.sparse[entities[inside]]
+            return rows
+        return self.sparse[entities]
+
+    def add(self, entities, entitycapacity, values):
+        # entities that already have the component just get the new values
+        self.grow(entitycapacity, self.size)
+        rows = self.sparse[entities]
+        if self.onremove is not None and values and (rows >= 0).any():
+            self.onremove(self, rows[rows >= 0])
+        new = entities[rows < 0]
+        if len(new):
+            self.grow(entitycapacity, self.size + len(new))
+            added = np.arange(self.size, self.size + len(new), dtype=np.int32)
+            self.sparse[new] = added
+            self.entities[added] = new
+            for column, dtype, default in self.spec:
+                self.columns[column][added] = default
+            self.size += len(new)
+            self.version += 1
+            rows = self.sparse[entities]
+        for column, value in values.items():
+            if column not in self.columns:
+                raise KeyError(f"{self.name} has no column {column}")
+            self.columns[column][rows] = value
+        if self.onadd is not None:
+            changed = rows if values else self.sparse[new]  # rows already there keep what they had
+            if len(changed):
+                self.onadd(self, changed)
+
+    def remove(self, entities):
+        rows = self.rows(entities)
+        rows = np.unique(rows[rows >= 0])
+        if not len(rows):
+            return
+        if self.onremove is not None:
+            self.onremove(self, rows)
+        size = self.size - len(rows)
+        # rows past the new end that survive fill the holes below it, in order
+        holes = rows[rows < size]
+        tail = np.ones(self.size - size, np.bool_)
+        tail[rows[rows >= size] - size] = False
+        movers = np.arange(size, self.size, dtype=np.int32)[tail]
+        self.sparse[self.entities[rows]] = -1
+        if len(holes):
+            for column in self.columns.values():
+                column[holes] = column[movers]
+            self.entities[holes] = self.entities[movers]
+            self.sparse[self.entities[holes]] = holes
+        self.size = size
+        self.version += 1
+
+class World:
+    # Entities are plain ids, what they are is which components they have. Systems run as
+    # whole-column numpy operations over the rows a query returns, never per entity.
+    def __init__(self, components=None):
+        self.stores = {name: ComponentStore(name, columns) for name, columns in (components or COMPONENTS).items()}
+        self.capacity = 0  # entity ids the sparse arrays cover
+        self.next = 0
+        self.free = []
+        self.alive = None
+        self.count = 0
+        self.bounds = None  # (left, top, right, bottom) the bounds system keeps moving entities inside
+        self.systems = [movementsystem, boundssystem, animationsystem]  # called with (world, dt) every step
+        self.queries = {}  # component names -> (store versions, entities, rows per store)
+        self.flipbooks = None  # atlas sprite indexes, each animation's frames in a run
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        return self.stores[name]
+
+    def create(self, count=1, **components):
+        # count new entities, components given as name={column: value or per entity array}
+        importnumpy()
+        reused = self.free[len(self.free) - min(count, len(self.free)):]
+        del self.free[len(self.free) - len(reused):]
+        fresh = count - len(reused)
+        entities = np.concatenate((np.array(reused, np.int32), np.arange(self.next, self.next + fresh, dtype=np.int32)))
+        self.next += fresh
+        self.count += count
+        if self.next > self.capacity:
+            self.capacity = max(ENTITYCAPACITY, self.capacity)
+            while self.capacity < self.next:
+                self.capacity *= 2
+            alive = np.zeros(self.capacity, np.bool_)
+            if self.alive is not None:
+                alive[:len(self.alive)] = self.alive
+            self.alive = alive
+        self.alive[entities] = True
+        for name, values in components.items():
+            self.add(name, entities, **values)
+        return entities
+
+    def add(self, name, entities, **values):
+        self.stores[name].add(np.asarray(entities, np.int32), self.capacity, values)
+
+    def remove(self, name, entities):
+        self.stores[name].remove(np.asarray(entities, np.int32))
+
+    def destroy(self, entities):
+        entities = np.unique(np.asarray(entities, np.int32))
+        if self.alive is None or not self.alive[entities].all():
+            raise KeyError("destroying an entity that does not exist")
+        self.alive[entities] = False
+        for store in self.stores.values():
+            store.remove(entities)
+        self.free.extend(entities.tolist())
+        self.count -= len(entities)
+
+    def addflipbook(self, sprites):
+        # the offset of sprites in self.flipbooks, for an animation component's first column
+        importnumpy()
+        first = 0 if self.flipbooks is None else len(self.flipbooks)
+        frames = np.asarray(sprites, np.int32)
+        self.flipbooks = frames if self.flipbooks is None else np.concatenate((self.flipbooks, frames))
+        return first
+
+    def query(self, *names):
+        # (entities, rows per store) of the entities that have every named component. Rows are
+        # slices while the stores line up row for row, which is how entities created together start.
+        stores = [self.stores[name] for name in names]
+        versions = tuple(store.version for store in stores)
+        cached = self.queries.get(names)
+        if cached is not None and cached[0] == versions:
+            return cached[1], cached[2]
+        importnumpy()
+        smallest = min(stores, key=len)
+        entities = smallest.entities[:smallest.size] if smallest.size else np.zeros(0, np.int32)
+        rows = [store.rows(entities) for store in stores]
+        present = np.ones(len(entities), np.bool_)
+        for found in rows:
+            present &= found >= 0
+        if not present.all():
+            entities = entities[present]
+            rows = [found[present] for found in rows]
+        count = len(entities)
+        rows = [slice(0, count) if np.array_equal(found, np.arange(count)) else found for found in rows]
+        self.queries[names] = (versions, entities, rows)
+        return entities, rows
+
+    @profiled("World.step")
+    def step(self, dt):
+        transform = self.stores.get("transform")
+        if transform is not None and transform.size:
+            np.copyto(transform["prevx"], transform["x"])
+            np.copyto(transform["prevy"], transform["y"])
+        for system in self.systems:
+            system(self, dt)
+
+@profiled("movementsystem")
+def movementsystem(world, dt):
+    entities, (rows, velocityrows) = world.query("transform", "velocity")
+    if not len(entities):
+        return
+    transform, velocity = world["transform"], world["velocity"]
+    if isinstance(rows, slice) and isinstance(velocityrows, slice):
+        # aligned stores: in place over the column views, no gathers
+        x, y = transform["x"][rows], transform["y"][rows]
+        x += velocity["vx"][velocityrows] * dt
+        y += velocity["vy"][velocityrows] * dt
+        return
+    transform.columns["x"][rows] += velocity.columns["vx"][velocityrows] * dt
+    transform.columns["y"][rows] += velocity.columns["vy"][velocityrows] * dt
+
+@profiled("boundssystem")
+def boundssystem(world, dt):
+    # moving entities bounce off the world bounds: clamped inside and the velocity reflected
+    if world.bounds is None:
+        return
+    entities, (rows, velocityrows) = world.query("transform", "velocity")
+    if not len(entities):
+        return
+    left, top, right, bottom = world.bounds
+    transform, velocity = world["transform"], world["velocity"]
+    for axis, speed, size, low, high in (("x", "vx", "w", left, right), ("y", "vy", "h", top, bottom)):
+        position = transform.columns[axis][rows]
+        extent = transform.columns[size][rows]
+        under = position < low
+        over = position + extent > high
+        if not (under.any() or over.any()):
+            continue
+        moving = velocity.columns[speed][velocityrows]
+        transform.columns[axis][rows] = np.where(under, low, np.where(over, high - extent, position))
+        velocity.columns[speed][velocityrows] = np.where(under, np.abs(moving), np.where(over, -np.abs(moving), moving))
+
+@profiled("animationsystem")
+def animationsystem(world, dt):
+    # flipbooks: frame n of an animation shows sprite world.flipbooks[first + n]
+    entities, (rows, spriterows) = world.query("animation", "sprite")
+    if not len(entities):
+        return
+    animation, sprite = world["animation"], world["sprite"]
+    clock = animation.columns["time"]
+    clock[rows] += dt
+    frames = (clock[rows] * animation.columns["fps"][rows]).astype(np.int32) % np.maximum(animation.columns["frames"][rows], 1)
+    sprite.columns["sprite"][spriterows] = world.flipbooks[animation.columns["first"][rows] + frames]
+
+class Viewport(QFrame):
+    def __init__(self):
+        super().__init__()
+        self.setStyleSheet("background-color: black;")
+        self.objects = ObjectStore()  # store drawable objects
+        self.grid = SpatialGrid()
+        self.world = World()  # entities, drawn live above every layer
+        self.world["material"].onadd = self.retainmaterials  # each entity holds its material slot, like an object
+        self.world["material"].onremove = self.releasematerials
+        self.systems = []  # callables run with dt on every simulation step, after the world's systems
+        self.alpha = 1.0  # interpolation factor between the last two steps
+        self.loop = FrameLoop(self.updatesimulation, self.rendersimulation)
+
+        # One entry per layer, back to front: a TileCache for retained layers, None for live ones
+        self.layers = [TileCache(), None]
+        self.atlas = TextureAtlas()
+        self.firstpaint = None  # called once after the next paint, --profile-startup sets it
+
+        self.overlay = False  # frame time percentiles drawn in the corner
+        self.painttimes = deque(maxlen=FRAMESTATSWINDOW)  # ms per paint, kept while the overlay shows
+        self.overlaytimer = QTimer()
+        self.overlaytimer.setInterval(OVERLAYMS)
+        self.overlaytimer.timeout.connect(lambda: self.update(self.overlayrect()))
+
+    def play(self):
+        self.loop.start()
+
+    def stop(self):
+        self.loop.stop()
+        self.alpha = 1.0
+        self.update()
+
+    def isplaying(self):
+        return self.loop.running
+
+    def setoverlay(self, enabled):
+        self.overlay = enabled
+        self.painttimes.clear()
+        if enabled:
+            self.overlaytimer.start()
+        else:
+            self.overlaytimer.stop()
+        self.update(self.overlayrect())
+
+    def overlayrect(self):
+        return QRect(4, 4, 300, 40)
+
+    def drawoverlay(self, painter):
+        # while playing the frame loop's intervals, otherwise how long paints take
+        if self.isplaying():
+            label, values = "frame", self.loop.stats.framems
+        else:
+            label, values = "paint", self.painttimes
+        p50, p95, p99 = percentiles(values)
+        text = f"{label} ms  p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f}\n{len(self.objects)} objects, {len(self.world)} entities"
+        rect = self.overlayrect()
+        painter.fillRect(rect, QColor(0, 0, 0, 170))
+        painter.setPen(QColor("white"))
+        painter.drawText(rect.adjusted(6, 0, -6, 0), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, text)
+
+    @profiled("Viewport.updatesimulation")
+    def updatesimulation(self, dt):
+        self.objects.snapshot()
+        self.world.step(dt)
+        for system in self.systems:
+            system(dt)
+
+    def rendersimulation(self, alpha):
+        self.alpha = alpha
+        self.repaint()
+
+    def updatebounds(self, x, y, w, h, layer=None):
+        rect = QRectF(x, y, w, h).toAlignedRect().adjusted(-1, -1, 1, 1)
+        if layer is not None and self.layers[layer] is not None:
+            self.layers[layer].invalidate(rect)
+        self.update(rect)
+
+    def addobject(self, x, y, w, h, material, layer=STATICLAYER):
+        # material is a Material or anything QColor takes, which becomes a plain fill
+        handle = self.objects.add(x, y, w, h, material, layer)
+        self.grid.insert(handle, x, y, w, h)
+        self.updatebounds(x, y, w, h, layer)
+        return handle
+
+    def addsprite(self, x, y, path, w=None, h=None, layer=STATICLAYER):
+        # an image drawn from the shared atlas, at its packed size unless w and h are given
+        sprite = self.atlas.sprite(path)
+        _, _, width, height = self.atlas.rects[sprite * 4:sprite * 4 + 4]
+        w = width if w is None else w
+        h = height if h is None else h
+        handle = self.objects.add(x, y, w, h, Qt.GlobalColor.transparent, layer, sprite)
+        self.grid.insert(handle, x, y, w, h)
+        self.updatebounds(x, y, w, h, layer)
+        return handle
+
+    def spawn(self, count, material=None, sprite=None, **components):
+        # count entities drawn with material (as for addobject) or with the atlas sprite of an
+        # image path; the other components go to World.create as name={column: value or array}
+        if sprite is not None:
+            material = Qt.GlobalColor.transparent
+        material = self.objects.materialslot(material)
+        components["material"] = {"material": material}
+        try:
+            if sprite is not None:
+                components["sprite"] = {"sprite": self.atlas.sprite(sprite)}
+            entities = self.world.create(count, **components)
+        finally:
+            self.objects.releasematerial(material)  # the entities hold their own references now
+        self.update()
+        return entities
+
+    def retainmaterials(self, store, rows):
+        indexes, counts = np.unique(store.columns["material"][rows], return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.objects.retainmaterial(index, count)
+
+    def releasematerials(self, store, rows):
+        indexes, counts = np.unique(store.columns["material"][rows], return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.objects.releasematerial(index, count)
+
+    def flipbook(self, paths):
+        # an animation component for entities that flip through paths, packed into the atlas
+        first = self.world.addflipbook([self.atlas.sprite(path) for path in paths])
+        return {"first": first, "frames": len(paths)}
+
+    def refreshsprite(self, path):
+        if self.atlas.refresh(path):
+            self.refreshcaches()
+
+    def refreshcaches(self):
+        # a material or atlas page changed in place, so every cached tile may show it
+        for cache in self.layers:
+            if cache is not None:
+                cache.clear()
+        self.update()
+
+    def moveobject(self, handle, x, y, w=None, h=None):
+        old = self.objects.bounds(handle)
+        self.objects.update(handle, x, y, w, h)
+        new = self.objects.bounds(handle)
+        self.grid.move(handle, old, new)
+        layer = int(self.objects.layer[handle])
+        self.updatebounds(*old, layer)
+        self.updatebounds(*new, layer)
+
+    def removeobject(self, handle):
+        bounds = self.objects.bounds(handle)
+        layer = int(self.objects.layer[handle])
+        self.objects.remove(handle)
+        self.grid.remove(handle, *bounds)
+        self.updatebounds(*bounds, layer)
+
+    def visibleslots(self, x, y, w, h, layer):
+        candidates = self.grid.query(x, y, w, h)
+        if not candidates:
+            return None
+        store = self.objects
+        slots = np.fromiter(candidates, np.int64, len(candidates))
+        slots = store.intersecting(slots, x, y, w, h)
+        return slots[store.layer[slots] == layer]
+
+    def drawobjects(self, painter, slots, alpha=1.0):
+        if slots is None or not len(slots):
+            return
+        store = self.objects
+        xs, ys = store.x[slots], store.y[slots]
+        if alpha < 1.0:
+            px, py = store.prevx[slots], store.prevy[slots]
+            xs, ys = px + (xs - px) * alpha, py + (ys - py) * alpha
+        sprites = store.sprite[slots] if len(self.atlas) else None
+        self.drawbatch(painter, slots, xs, ys, store.w[slots], store.h[slots], store.material[slots], sprites)
+
+    def drawentities(self, painter, rect, alpha=1.0):
+        # entities with a transform and a material, culled against rect as whole columns
+        entities, (rows, materialrows) = self.world.query("transform", "material")
+        if not len(entities):
+            return
+        transform = self.world["transform"]
+        xs, ys = transform.columns["x"][rows], transform.columns["y"][rows]
+        if alpha < 1.0:
+            px, py = transform.columns["prevx"][rows], transform.columns["prevy"][rows]
+            xs, ys = px + (xs - px) * alpha, py + (ys - py) * alpha
+        ws, hs = transform.columns["w"][rows], transform.columns["h"][rows]
+        visible = np.flatnonzero((xs < rect.x() + rect.width()) & (xs + ws > rect.x()) & (ys < rect.y() + rect.height()) & (ys + hs > rect.y()))
+        if not len(visible):
+            return
+        materials = self.world["material"].columns["material"][materialrows][visible]
+        sprites = None
+        spritestore = self.world["sprite"]
+        if len(self.atlas) and len(spritestore):
+            spriterows = spritestore.rows(entities[visible])
+            sprites = np.where(spriterows >= 0, spritestore.columns["sprite"][spriterows], -1)
+        self.drawbatch(painter, visible, xs[visible], ys[visible], ws[visible], hs[visible], materials, sprites)
+
+    def drawbatch(self, painter, order, xs, ys, ws, hs, materials, sprites=None):
+        # order keeps draws stable within a material or atlas page: slots for objects, query rows for entities
+        if sprites is not None:
+            atlased = sprites >= 0
+            if atlased.any():
+                self.drawsprites(painter, order[atlased], xs[atlased], ys[atlased], ws[atlased], hs[atlased], sprites[atlased])
+                plain = ~atlased
+                order, xs, ys, ws, hs, materials = order[plain], xs[plain], ys[plain], ws[plain], hs[plain], materials[plain]
+                if not len(order):
+                    return
+
+        # Bucketed by material: one painter state change and one drawRects call per material.
+        # QRectF is four qreals (x, y, width, height), so each bucket is filled through the array's buffer.
+        sort = np.lexsort((order, materials))
+        materials = materials[sort]
+        splits = np.flatnonzero(np.diff(materials)) + 1
+        table = np.empty((len(order), 4), np.float64)
+        table[:, 0], table[:, 1], table[:, 2], table[:, 3] = xs[sort], ys[sort], ws[sort], hs[sort]
+        painter.save()
+        previous = None
+        for start, stop in zip(np.concatenate(([0], splits)).tolist(), np.concatenate((splits, [len(order)])).tolist()):
+            material = self.objects.materials[materials[start]]
+            material.apply(painter, previous)
+            previous = material
+            rects = sip.array(QRectF, stop - start)
+            np.frombuffer(rects, np.float64).reshape(-1, 4)[:] = table[start:stop]
+            painter.drawRects(rects)
+        painter.restore()
+
+    def drawsprites(self, painter, order, xs, ys, ws, hs, sprites):
+        # One drawPixmapFragments call per atlas page
+        pages, rects = self.atlas.tables()
+        spritepages = pages[sprites]
+        sort = np.lexsort((order, spritepages))
+        xs, ys, ws, hs, sprites, spritepages = xs[sort], ys[sort], ws[sort], hs[sort], sprites[sort], spritepages[sort]
+        splits = np.flatnonzero(np.diff(spritepages)) + 1
+        source = rects[sprites]
+
+        # PixmapFragment is ten qreals (x, y, sourceLeft, sourceTop, width, height, scaleX, scaleY,
+        # rotation, opacity), so whole batches are filled through the array's buffer
+        table = np.empty((len(sprites), 10), np.float64)
+        table[:, 0] = xs + ws / 2
+        table[:, 1] = ys + hs / 2
+        table[:, 2:6] = source
+        table[:, 6] = ws / np.maximum(source[:, 2], 1)
+        table[:, 7] = hs / np.maximum(source[:, 3], 1)
+        table[:, 8] = 0.0
+        table[:, 9] = 1.0
+        for start, stop in zip(np.concatenate(([0], splits)).tolist(), np.concatenate((splits, [len(sprites)])).tolist()):
+            fragments = sip.array(QPainter.PixmapFragment, stop - start)
+            np.frombuffer(fragments, np.float64).reshape(-1, 10)[:] = table[start:stop]
+            painter.drawPixmapFragments(fragments, self.atlas.pixmap(int(spritepages[start])))
+
+    def rasterizetile(self, layer, tx, ty, tilesize):
+        x, y = tx * tilesize, ty * tilesize
+        slots = self.visibleslots(x, y, tilesize, tilesize, layer)
+        if slots is None or not len(slots):
+            return None  # nothing here, remember that so we skip the blit
+
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(math.ceil(tilesize * ratio), math.ceil(tilesize * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.translate(-x, -y)
+        self.drawobjects(painter, slots)
+        painter.end()
+        return pixmap
+
+    @profiled("Viewport.paintEvent")
+    def paintEvent(self, event):
+        start = time.perf_counter()
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+        # Only draw what intersects the region Qt asked us to repaint
+        rect = event.rect()
+        for layer, cache in enumerate(self.layers):
+            if cache is None:
+                self.drawobjects(painter, self.visibleslots(rect.x(), rect.y(), rect.width(), rect.height(), layer), self.alpha)
+                continue
+
+            # Cached layers just blit the part of each tile that falls inside the dirty rect
+            tilesize = cache.tilesize
+            for tx, ty in cache.tilesin(rect):
+                pixmap = cache.get(tx, ty, lambda tx, ty: self.rasterizetile(layer, tx, ty, tilesize))
+                if pixmap is None:
+                    continue
+                tilerect = QRect(tx * tilesize, ty * tilesize, tilesize, tilesize)
+                target = tilerect.intersected(rect)
+                source = QRectF(target.translated(-tilerect.topLeft()))
+                ratio = pixmap.devicePixelRatio()
+                painter.drawPixmap(QRectF(target), pixmap, QRectF(source.x() * ratio, source.y() * ratio, source.width() * ratio, source.height() * ratio))
+        self.drawentities(painter, rect, self.alpha)
+
+        if self.overlay:
+            if rect != self.overlayrect():  # the overlay's own refreshes would skew its numbers
+                self.painttimes.append((time.perf_counter() - start) * 1000)
+            self.drawoverlay(painter)
+        painter.end()
+
+        if self.firstpaint is not None:
+            callback, self.firstpaint = self.firstpaint, None
+            callback()
+
+class CustomSplitterHandle(QSplitterHandle):
+    def __init__(self, orientation, parent):
+        super().__init__(orientation, parent)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.RightButton:
+            self.parent().reset_sizes()
+        super().mousePressEvent(event)
+
+class CustomSplitter(QSplitter):
+    def __init__(self, orientation, parent=None, reset_sizes=None):
+        super().__init__(orientation, parent)
+        self.reset_sizes_list = reset_sizes
+        self.setHandleWidth(2)
+
+    def createHandle(self):
+        return CustomSplitterHandle(self.orientation(), self)
+
+    def reset_sizes(self):
+        if self.reset_sizes_list:
+            self.setSizes(self.reset_sizes_list)
+
+class IconRegistry:
+    # Each asset type icon is read from disk once and pre-rendered at every allowed icon size,
+    # callers share the same QIcon so changing ICONSIZE never rescales anything.
+    def __init__(self, paths, sizes=range(MINICONSIZE, MAXICONSIZE + 1)):
+        self.paths = paths
+        self.sizes = sizes
+        self.icons = {}
+
+    def icon(self, assettype):
+        icon = self.icons.get(assettype)
+        if icon is None:
+            icon = self.icons[assettype] = self.build(self.paths[assettype])
+        return icon
+
+    def pixmap(self, assettype, size):
+        return self.icon(assettype).pixmap(size, size)
+
+    def build(self, path):
+        icon = QIcon()
+        source = QImage(str(path))
+        if source.isNull():
+            return icon
+        ratio = QApplication.instance().devicePixelRatio()
+        for size in self.sizes:
+            scaled = source.scaled(round(size * ratio), round(size * ratio),
+                                   Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+            pixmap = QPixmap.fromImage(scaled)
+            pixmap.setDevicePixelRatio(ratio)
+            icon.addPixmap(pixmap)
+        return icon
+
+iconregistry = IconRegistry(ASSETICONPATHS)
+
+def renderimagethumbnail(path, size):
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    source = reader.size()
+    if source.isValid() and source.width() * source.height() > IMAGEPYRAMIDPIXELS:
+        pyramid = openpyramid(path)
+        try:
+            return pyramid.thumbnail(size)
+        finally:
+            pyramid.close()
+    if source.isValid():
+        # let the decoder downscale while reading, large images never decode at full size
+        reader.setScaledSize(source.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return None
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+    return image
+
+def renderwaveformthumbnail(path, size):
+    peaks = openpeaks(path)
+    try:
+        if not peaks.frames:
+            return None
+        lows, highs = peaks.peaks(0, peaks.frames, size)
+    finally:
+        peaks.close()
+    image = QImage(size, size, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(QColor(WAVEFORMBACKGROUND))
+    painter = QPainter(image)
+    drawwaveform(painter, QRectF(0, 0, size, size), lows, highs)
+    painter.end()
+    return image
+
+def drawwaveform(painter, rect, lows, highs):
+    # one column rect per (low, high) pair, at least a pixel tall so silence still shows a line
+    middle = rect.center().y()
+    half = rect.height() / 2
+    tops = middle - highs * half
+    heights = np.maximum((highs - lows) * half, 1.0)
+    xs = rect.left() + np.arange(len(lows), dtype=np.float64) * (rect.width() / max(len(lows), 1))
+    width = max(rect.width() / max(len(lows), 1), 1.0)
+    painter.save()
+    painter.setPen(Qt.PenStyle.NoPen)
+    painter.setBrush(QColor(WAVEFORMCOLOR))
+    painter.drawRects(list(map(QRectF, xs.tolist(), tops.tolist(), [width] * len(lows), heights.tolist())))
+    painter.restore()
+
+def rendermaterialswatch(material, size):
+    image = QImage(size, size, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.transparent)
+    base = QColor(material.color)
+    gradient = QRadialGradient(size * 0.35, size * 0.35, size * 0.65)
+    gradient.setColorAt(0.0, base.lighter(170))
+    gradient.setColorAt(0.6, base)
+    gradient.setColorAt(1.0, base.darker(250))
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setPen(Qt.PenStyle.NoPen)
+    painter.setOpacity(max(material.opacity, 0.15))  # a fully transparent swatch would look like a missing one
+    painter.setBrush(gradient)
+    painter.drawEllipse(1, 1, size - 2, size - 2)
+    painter.end()
+    return image
+
+def imagebytes(image):
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    return bytes(bits)
+
+class ImagePyramid:
+    # A mip pyramid of compressed tiles in one mapped file. Level 0 is full size, each level
+    # halves the one before down to a single tile. Only the tiles asked for are decompressed.
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.tilesize, self.width, self.height, count = PYRAMIDHEADER.unpack_from(self.data, 0)
+            if magic != PYRAMIDMAGIC or version != PYRAMIDVERSION:
+                raise ValueError(f"{path} is not an image pyramid")
+            self.levels = []  # (width, height, columns, rows, first tile index)
+            offset = PYRAMIDHEADER.size
+            first = 0
+            for level in range(count):
+                width, height, columns, rows = PYRAMIDLEVEL.unpack_from(self.data, offset)
+                self.levels.append((width, height, columns, rows, first))
+                offset += PYRAMIDLEVEL.size
+                first += columns * rows
+            if offset + PYRAMIDTILE.size * first > len(self.data):
+                raise ValueError(f"{path} is cut short")
+        except (ValueError, struct.error) as error:
+            self.data.close()
+            raise ValueError(str(error)) from None
+        self.tableoffset = offset
+
+    @staticmethod
+    def levelsizes(width, height, tilesize):
+        sizes = [(width, height)]
+        while max(width, height) > tilesize:
+            width, height = (width + 1) // 2, (height + 1) // 2
+            sizes.append((width, height))
+        return sizes
+
+    @staticmethod
+    def build(source, path, tilesize=PYRAMIDTILESIZE):
+        # Level 0 comes from the source in horizontal bands where the decoder can read regions,
+        # every other level from four tiles of the level below, so memory stays at a band.
+        # Only JPEG reads regions; PNG, BMP, WebP and the rest decode whole, so building from
+        # them peaks at the full decoded image: 4 bytes a pixel, 8 for 16-bit PNGs, which is
+        # 324 MB for 9000x9000, up to IMAGEDECODELIMIT megabytes
+        reader = QImageReader(source)
+        size = reader.size()
+        if not size.isValid():
+            raise ValueError(f"{source}: {reader.errorString()}")
+        width, height = size.width(), size.height()
+        sizes = ImagePyramid.levelsizes(width, height, tilesize)
+        grids = [((w + tilesize - 1) // tilesize, (h + tilesize - 1) // tilesize) for w, h in sizes]
+        index = []  # (offset, length) per tile, level by level in row order
+        start = PYRAMIDHEADER.size + PYRAMIDLEVEL.size * len(sizes) + PYRAMIDTILE.size * sum(c * r for c, r in grids)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, 'w+b') as f:
+            f.truncate(start)
+            f.seek(start)
+
+            def write(tile):
+                payload = zlib.compress(imagebytes(tile), 1)
+                f.seek(0, os.SEEK_END)  # reading the level below moves the position
+                index.append((f.tell(), len(payload)))
+                f.write(payload)
+
+            def read(tileindex, w, h):
+                offset, length = index[tileindex]
+                payload = bytearray(length)
+                f.seek(offset)
+                f.readinto(payload)
+                data = zlib.decompress(payload)
+                return QImage(data, w, h, w * 4, QImage.Format.Format_ARGB32_Premultiplied).copy()
+
+            regions = reader.supportsOption(QImageIOHandler.ImageOption.ClipRect)
+            bandrows = height
+            if regions:
+                bandrows = max(1, IMAGEBANDBYTES // (width * 4 * tilesize)) * tilesize
+            else:
+                needed = (width * height * 8 >> 20) + 1
+                if needed > IMAGEDECODELIMIT:
+                    raise ValueError(f"{source}: {width}x{height} is too big to decode whole")
+                with PYRAMIDLOCK:
+                    # Qt refuses decodes over 256 MB by default; the limit is process wide, so
+                    # it is only ever raised, never put back under a decode still running
+                    limit = QImageReader.allocationLimit()
+                    if limit and limit < needed:
+                        QImageReader.setAllocationLimit(needed)
+            columns, rows = grids[0]
+            for top in range(0, height, bandrows):
+                bandreader = QImageReader(source)
+                if regions:
+                    bandreader.setClipRect(QRect(0, top, width, min(bandrows, height - top)))
+                band = bandreader.read()
+                if band.isNull():
+                    raise ValueError(f"{source}: {bandreader.errorString()}")
+                for y in range(0, band.height(), tilesize):
+                    for x in range(0, width, tilesize):
+                        tile = band.copy(x, y, min(tilesize, width - x), min(tilesize, band.height() - y))
+                        write(tile.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied))
+                del band
+
+            first = 0
+            for level in range(1, len(sizes)):
+                (pw, ph), (pcolumns, prows) = sizes[level - 1], grids[level - 1]
+                (w, h), (columns, rows) = sizes[level], grids[level]
+                for row in range(rows):
+                    for column in range(columns):
+                        tw, th = min(tilesize, w - column * tilesize), min(tilesize, h - row * tilesize)
+                        quad = QImage(tw * 2, th * 2, QImage.Format.Format_ARGB32_Premultiplied)
+                        quad.fill(Qt.GlobalColor.transparent)
+                        painter = QPainter(quad)
+                        for dy in (0, 1):
+                            for dx in (0, 1):
+                                pc, pr = column * 2 + dx, row * 2 + dy
+                                if pc < pcolumns and pr < prows:
+                                    sw, sh = min(tilesize, pw - pc * tilesize), min(tilesize, ph - pr * tilesize)
+                                    painter.drawImage(dx * tilesize, dy * tilesize, read(first + pr * pcolumns + pc, sw, sh))
+                        painter.end()
+                        write(quad.scaled(tw, th, Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation))
+                first += pcolumns * prows
+
+            f.seek(0)
+            f.write(PYRAMIDHEADER.pack(PYRAMIDMAGIC, PYRAMIDVERSION, tilesize, width, height, len(sizes)))
+            for (w, h), (columns, rows) in zip(sizes, grids):
+                f.write(PYRAMIDLEVEL.pack(w, h, columns, rows))
+            for offset, length in index:
+                f.write(PYRAMIDTILE.pack(offset, length))
+        os.replace(temp, path)
+
+    def level(self, scale):
+        # the smallest level that still has at least one pixel per displayed pixel
+        level = 0
+        while level + 1 < len(self.levels) and scale * (1 << (level + 1)) <= 1.0:
+            level += 1
+        return level
+
+    def tile(self, level, column, row):
+        width, height, columns, rows, first = self.levels[level]
+        offset, length = PYRAMIDTILE.unpack_from(self.data, self.tableoffset + PYRAMIDTILE.size * (first + row * columns + column))
+        w = min(self.tilesize, width - column * self.tilesize)
+        h = min(self.tilesize, height - row * self.tilesize)
+        data = zlib.decompress(self.data[offset:offset + length])
+        return QImage(data, w, h, w * 4, QImage.Format.Format_ARGB32_Premultiplied).copy()
+
+    def thumbnail(self, size):
+        # the top level is a single tile, the first level at or above size usually is too
+        level = len(self.levels) - 1
+        while level > 0 and max(self.levels[level][:2]) < size:
+            level -= 1
+        width, height, columns, rows, _ = self.levels[level]
+        image = QImage(width, height, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(image)
+        for row in range(rows):
+            for column in range(columns):
+                painter.drawImage(column * self.tilesize, row * self.tilesize, self.tile(level, column, row))
+        painter.end()
+        return image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+    def close(self):
+        self.data.close()
+
+PYRAMIDLOCK = threading.Lock()
+PYRAMIDBUILDS = {}  # pyramid path -> lock held while it is built
+
+def openpyramid(source, cachedir=None):
+    # the pyramid for source, built on first use; call from a worker thread
+    cachedir = cachedir or pyramidcachepath
+    stat = os.stat(source)
+    text = f"{os.path.abspath(source)}|{stat.st_mtime_ns}|{stat.st_size}|{PYRAMIDTILESIZE}"
+    path = os.path.join(cachedir, hashlib.sha1(text.encode()).hexdigest() + PYRAMIDEXTENSION)
+    with PYRAMIDLOCK:
+        lock = PYRAMIDBUILDS.setdefault(path, threading.Lock())
+    with lock:
+        if os.path.exists(path):
+            try:
+                pyramid = ImagePyramid(path)
+            except ValueError:
+                os.remove(path)  # a cut off or unreadable cache file, built again below
+            else:
+                try:
+                    os.utime(path)  # mtime doubles as last use, like the thumbnail cache
+                except OSError:
+                    pass
+                return pyramid
+        os.makedirs(cachedir, exist_ok=True)
+        ImagePyramid.build(source, path)
+        prunepyramids(cachedir, keep=path)
+        return ImagePyramid(path)
+
+def prunepyramids(cachedir, limit=PYRAMIDCACHELIMIT, keep=None, extension=PYRAMIDEXTENSION):
+    found = []
+    for entry in os.scandir(cachedir):
+        if entry.name.endswith(extension):
+            stat = entry.stat()
+            found.append((stat.st_mtime, entry.path, stat.st_size))
+    total = sum(size for _, _, size in found)
+    for _, path, size in sorted(found):
+        if total <= limit:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+class WaveFile:
+    # A RIFF or RF64 WAV file read through a read-only mapping. Frames are converted a chunk
+    # at a time and the mapped pages behind each chunk dropped again, so memory stays flat
+    # however long the recording is.
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.parse(path)
+        except (ValueError, struct.error) as error:
+            self.data.close()
+            raise ValueError(f"{path}: {error}") from None
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            self.data.madvise(mmap.MADV_SEQUENTIAL)
+
+    def parse(self, path):
+        data = self.data
+        if data[0:4] not in (b"RIFF", b"RF64") or data[8:12] != b"WAVE":
+            raise ValueError("not a WAV file")
+        fmt = None
+        bigsize = None  # RF64 keeps the real data size in its ds64 chunk
+        self.offset = None
+        position = 12
+        while position + 8 <= len(data):
+            chunkid = data[position:position + 4]
+            size, = struct.unpack_from("<I", data, position + 4)
+            body = position + 8
+            if chunkid == b"ds64":
+                bigsize, = struct.unpack_from("<Q", data, body + 8)
+            elif chunkid == b"fmt ":
+                fmt = struct.unpack_from("<HHIIHH", data, body)
+                if fmt[0] == WAVEEXTENSIBLE and size >= 26:
+                    fmt = struct.unpack_from("<H", data, body + 24) + fmt[1:]
+            elif chunkid == b"data":
+                if size == 0xFFFFFFFF and bigsize is not None:
+                    size = bigsize
+                self.offset = body
+                self.size = min(size, len(data) - body)  # a cut off recording keeps what was written
+                break
+            position = body + size + (size & 1)
+        if fmt is None or self.offset is None:
+            raise ValueError("no fmt or data chunk")
+        code, self.channels, self.rate, _, self.blockalign, _ = fmt
+        if not self.channels or not self.blockalign:
+            raise ValueError("no channels")
+        self.samplewidth = self.blockalign // self.channels
+        if (code, self.samplewidth) not in WAVESAMPLETYPES:
+            raise ValueError(f"unsupported sample format {code} with {self.samplewidth} byte samples")
+        self.dtype = WAVESAMPLETYPES[code, self.samplewidth]
+        self.zero = 128 if self.samplewidth == 1 else 0
+        self.scale = 1.0 if code == WAVEFLOAT else float(1 << (8 * self.samplewidth - 1))
+        self.frames = self.size // self.blockalign
+
+    def raw(self, first, count):
+        # frames [first, first + count) as stored, one column per channel, copied out of the mapping
+        importnumpy()
+        begin = self.offset + first * self.blockalign
+        if self.dtype is None:
+            triples = np.frombuffer(self.data, np.uint8, count * self.blockalign, begin).reshape(-1, 3).astype(np.int32)
+            samples = (triples[:, 0] | triples[:, 1] << 8 | triples[:, 2] << 16) << 8 >> 8  # sign extended
+        else:
+            samples = np.frombuffer(self.data, self.dtype, count * self.channels, begin).copy()
+        return samples.reshape(count, self.channels)
+
+    def read(self, first, count):
+        # the same frames as float32 in -1..1
+        samples = self.raw(first, count).astype(np.float32)
+        if self.zero:
+            samples -= self.zero
+        samples /= self.scale
+        return samples
+
+    def chunks(self, start=0, stop=None, size=WAVECHUNKFRAMES, read=None):
+        read = read or self.read
+        stop = self.frames if stop is None else min(stop, self.frames)
+        for first in range(start, stop, size):
+            count = min(size, stop - first)
+            yield first, read(first, count)
+            self.release(first, count)
+
+    def release(self, first, count):
+        # drops the pages behind converted frames; the page cache keeps them for the next reader
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        begin = self.offset + first * self.blockalign
+        end = begin + count * self.blockalign
+        begin -= begin % mmap.PAGESIZE
+        end -= end % mmap.PAGESIZE
+        if end > begin:
+            self.data.madvise(mmap.MADV_DONTNEED, begin, end - begin)
+
+    def close(self):
+        self.data.close()
+
+class PeakPyramid:
+    # Min/max pairs of an audio file in one mapped file. Level 0 holds a pair per block of
+    # frames across all channels, each level halves the one before down to a single pair, so
+    # any zoom reads about as many pairs as there are pixel columns.
+    def __init__(self, path):
+        importnumpy()
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.channels, self.rate, self.blockframes, self.frames, count = PEAKHEADER.unpack_from(self.data, 0)
+            if magic != PEAKMAGIC or version != PEAKVERSION:
+                raise ValueError(f"{path} is not a peak pyramid")
+            self.levels = []  # (offset, pairs)
+            for level in range(count):
+                self.levels.append(PEAKLEVEL.unpack_from(self.data, PEAKHEADER.size + PEAKLEVEL.size * level))
+            if not self.levels or max(offset + pairs * 4 for offset, pairs in self.levels) > len(self.data):
+                raise ValueError(f"{path} is cut short")
+        except (ValueError, struct.error) as error:
+            self.data.close()
+            raise ValueError(str(error)) from None
+
+    @staticmethod
+    def levelcounts(frames, blockframes):
+        counts = [max(1, -(-frames // blockframes))]
+        while counts[-1] > 1:
+            counts.append((counts[-1] + 1) // 2)
+        return counts
+
+    @staticmethod
+    def build(source, path, blockframes=PEAKBLOCKFRAMES):
+        # One streaming pass: every chunk adds its level 0 pairs and carries an odd pair per
+        # level over to the next chunk, so only a chunk and a few pairs are held at once
+        importnumpy()
+        wav = WaveFile(source)
+        try:
+            counts = PeakPyramid.levelcounts(wav.frames, blockframes)
+            cursors = []
+            offset = PEAKHEADER.size + PEAKLEVEL.size * len(counts)
+            for count in counts:
+                cursors.append(offset)
+                offset += count * 4
+            levels = list(zip(cursors, counts))
+            carries = [None] * len(counts)
+            temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp, 'w+b') as f:
+                f.truncate(offset)
+
+                def add(level, pairs):
+                    f.seek(cursors[level])
+                    f.write(pairs.tobytes())
+                    cursors[level] += pairs.nbytes
+                    if level + 1 == len(counts):
+                        return
+                    if carries[level] is not None:
+                        pairs = np.concatenate((carries[level], pairs))
+                        carries[level] = None
+                    even = len(pairs) & ~1
+                    if even < len(pairs):
+                        carries[level] = pairs[even:]
+                    if even:
+                        quads = pairs[:even].reshape(-1, 2, 2)
+                        add(level + 1, np.stack((quads[:, :, 0].min(1), quads[:, :, 1].max(1)), axis=1))
+
+                chunkframes = max(1, WAVECHUNKFRAMES // blockframes) * blockframes
+                for first, samples in wav.chunks(size=chunkframes, read=wav.raw):
+                    # a block's frames are contiguous with their channels interleaved, so each block
+                    # reduces as one row in the stored sample type and only the results get scaled
+                    samples = samples.reshape(-1)
+                    if len(samples) % (blockframes * wav.channels):
+                        samples = np.pad(samples, (0, blockframes * wav.channels - len(samples) % (blockframes * wav.channels)), 'edge')
+                    blocks = samples.reshape(-1, blockframes * wav.channels)
+                    lows = (blocks.min(1).astype(np.float64) - wav.zero) / wav.scale
+                    highs = (blocks.max(1).astype(np.float64) - wav.zero) / wav.scale
+                    del samples, blocks
+                    pairs = np.empty((len(lows), 2), np.int16)
+                    pairs[:, 0] = np.clip(np.floor(lows * 32767), -32767, 32767)
+                    pairs[:, 1] = np.clip(np.ceil(highs * 32767), -32767, 32767)
+                    add(0, pairs)
+                for level in range(len(counts) - 1):
+                    if carries[level] is not None:
+                        pair, carries[level] = carries[level], None
+                        add(level + 1, pair)
+
+                f.seek(0)
+                f.write(PEAKHEADER.pack(PEAKMAGIC, PEAKVERSION, wav.channels, wav.rate, blockframes, wav.frames, len(counts)))
+                for level in levels:
+                    f.write(PEAKLEVEL.pack(*level))
+            os.replace(temp, path)
+        finally:
+            wav.close()
+
+    def level(self, span):
+        # the coarsest level with no more than span frames behind each pair
+        level = 0
+        while level + 1 < len(self.levels) and self.blockframes << (level + 1) <= span:
+            level += 1
+        return level
+
+    def peaks(self, start, stop, columns):
+        # (lows, highs) as float32 in -1..1 for columns evenly splitting frames [start, stop)
+        span = (stop - start) / columns
+        level = self.level(span)
+        offset, count = self.levels[level]
+        block = self.blockframes << level
+        first = min(int(start // block), count - 1)
+        last = max(first + 1, min(count, -(-int(stop) // block)))
+        pairs = np.frombuffer(self.data, np.int16, (last - first) * 2, offset + first * 4).reshape(-1, 2)
+        lows, highs = reducecolumns(pairs[:, 0], pairs[:, 1], start / block - first, span / block, columns)
+        del pairs
+        return lows.astype(np.float32) / 32767, highs.astype(np.float32) / 32767
+
+    def close(self):
+        self.data.close()
+
+def reducecolumns(lows, highs, first, span, columns):
+    # min and max of each column's run of values, a run starting every span values from first
+    starts = np.clip((first + np.arange(columns) * span).astype(np.int64), 0, len(lows) - 1)
+    return np.minimum.reduceat(lows, starts), np.maximum.reduceat(highs, starts)
+
+def openpeaks(source, cachedir=None):
+    # the peak pyramid for source, built on first use; call from a worker thread
+    cachedir = cachedir or peakcachepath
+    stat = os.stat(source)
+    text = f"{os.path.abspath(source)}|{stat.st_mtime_ns}|{stat.st_size}|{PEAKBLOCKFRAMES}"
+    path = os.path.join(cachedir, hashlib.sha1(text.encode()).hexdigest() + PEAKEXTENSION)
+    with PYRAMIDLOCK:
+        lock = PYRAMIDBUILDS.setdefault(path, threading.Lock())
+    with lock:
+        if os.path.exists(path):
+            try:
+                peaks = PeakPyramid(path)
+            except ValueError:
+                os.remove(path)  # a cut off or unreadable cache file, built again below
+            else:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return peaks
+        os.makedirs(cachedir, exist_ok=True)
+        PeakPyramid.build(source, path)
+        prunepyramids(cachedir, PEAKCACHELIMIT, keep=path, extension=PEAKEXTENSION)
+        return PeakPyramid(path)
+
+class ImageView(QWidget):
+    # Pans and zooms one image. Large ones paint only the visible tiles of the pyramid level
+    # that matches the zoom, so memory follows the window size rather than the image size;
+    # images up to IMAGEPYRAMIDPIXELS are simply decoded whole.
+    def __init__(self, source):
+        super().__init__()
+        self.setWindowTitle(os.path.basename(source))
+        self.resize(900, 700)
+        self.source = source
+        self.pyramid = None
+        self.pixmap = None  # the whole image, when it is small enough to skip the pyramid
+        self.imagesize = None  # (width, height) once loaded
+        self.error = None
+        self.result = None  # set by the loading thread
+        self.tiles = OrderedDict()  # (level, column, row) -> QPixmap, least recently drawn first
+        self.scale = 1.0  # display pixels per source pixel
+        self.offset = QPointF(0, 0)
+        self.dragstart = None
+
+        threading.Thread(target=self.load, name="image view", daemon=True).start()
+        self.loadtimer = QTimer()
+        self.loadtimer.setInterval(THUMBPOLLMS)
+        self.loadtimer.timeout.connect(self.checkloaded)
+        self.loadtimer.start()
+
+    def load(self):
+        try:
+            reader = QImageReader(self.source)
+            size = reader.size()
+            if size.isValid() and size.width() * size.height() <= IMAGEPYRAMIDPIXELS:
+                image = reader.read()
+                if image.isNull():
+                    raise ValueError(reader.errorString())
+                self.result = image
+            else:
+                self.result = openpyramid(self.source)
+        except Exception as error:
+            # anything, so the view reports it instead of waiting for a result that never comes
+            self.result = error
+
+    def checkloaded(self):
+        if self.result is None:
+            return
+        self.loadtimer.stop()
+        if isinstance(self.result, Exception):
+            self.error = f"Could not open {self.source}: {self.result}"
+        elif isinstance(self.result, QImage):
+            self.pixmap = QPixmap.fromImage(self.result)
+            self.imagesize = (self.pixmap.width(), self.pixmap.height())
+            self.fit()
+        else:
+            self.pyramid = self.result
+            self.imagesize = (self.pyramid.width, self.pyramid.height)
+            self.fit()
+        self.result = None
+        self.update()
+
+    def fit(self):
+        width, height = self.imagesize
+        self.scale = min(self.width() / width, self.height() / height, 1.0)
+        self.offset = QPointF((self.width() - width * self.scale) / 2, (self.height() - height * self.scale) / 2)
+
+    def cachedtile(self, level, column, row):
+        key = (level, column, row)
+        pixmap = self.tiles.get(key)
+        if pixmap is None:
+            pixmap = self.tiles[key] = QPixmap.fromImage(self.pyramid.tile(level, column, row))
+            while len(self.tiles) > IMAGEVIEWTILES:
+                self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(key)
+        return pixmap
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(40, 40, 40))
+        if self.imagesize is None:
+            painter.setPen(QColor("white"))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, self.error or f"Preparing {os.path.basename(self.source)}...")
+            return
+        if self.pixmap is not None:
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+            target = QRectF(self.offset.x(), self.offset.y(), self.pixmap.width() * self.scale, self.pixmap.height() * self.scale)
+            painter.drawPixmap(target, self.pixmap, QRectF(self.pixmap.rect()))
+            painter.end()
+            return
+
+        pyramid = self.pyramid
+        level = pyramid.level(self.scale)
+        _, _, columns, rows, _ = pyramid.levels[level]
+        factor = (1 << level) * self.scale  # display pixels per pixel of this level
+        span = pyramid.tilesize * factor
+        rect = event.rect()
+        ox, oy = self.offset.x(), self.offset.y()
+        first = max(0, int((rect.left() - ox) // span)), max(0, int((rect.top() - oy) // span))
+        last = min(columns - 1, int((rect.right() - ox) // span)), min(rows - 1, int((rect.bottom() - oy) // span))
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        for row in range(first[1], last[1] + 1):
+            for column in range(first[0], last[0] + 1):
+                pixmap = self.cachedtile(level, column, row)
+                target = QRectF(ox + column * span, oy + row * span, pixmap.width() * factor, pixmap.height() * factor)
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+        painter.end()
+
+    def wheelEvent(self, event):
+        if self.imagesize is None:
+            return
+        scale = min(8.0, max(0.01, self.scale * 1.25 ** (event.angleDelta().y() / 120)))
+        position = event.position()
+        self.offset = position - (position - self.offset) * (scale / self.scale)  # keeps the point under the cursor
+        self.scale = scale
+        self.update()
+
+    def mousePressEvent(self, event):
+        self.dragstart = event.position() - self.offset
+
+    def mouseMoveEvent(self, event):
+        if self.dragstart is not None:
+            self.offset = event.position() - self.dragstart
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        self.dragstart = None
+
+    def mouseDoubleClickEvent(self, event):
+        if self.imagesize is not None:
+            self.fit()
+            self.update()
+
+    def closeEvent(self, event):
+        self.loadtimer.stop()
+        self.tiles.clear()
+        self.pixmap = None
+        if self.pyramid is not None:
+            self.pyramid.close()
+            self.pyramid = None
+        super().closeEvent(event)
+
+class WaveformView(QWidget):
+    # Waveform of one audio file. Columns come from the peak pyramid level that matches the
+    # zoom, or straight from the samples once a column covers less than a peak block.
+    def __init__(self):
+        super().__init__()
+        self.setMinimumHeight(96)
+        self.source = None
+        self.peaks = None
+        self.wav = None
+        self.error = None
+        self.results = queue.SimpleQueue()  # (source, peaks and wav or the error) from loading threads
+        self.start = 0  # visible frames
+        self.stop = 0
+        self.dragstart = None
+
+        self.loadtimer = QTimer()
+        self.loadtimer.setInterval(THUMBPOLLMS)
+        self.loadtimer.timeout.connect(self.checkloaded)
+
+    def setsource(self, source, reload=False):
+        if source == self.source and not reload:
+            return
+        self.closefiles()
+        self.source = source
+        self.error = None
+        if source:
+            threading.Thread(target=self.load, args=(source,), name="waveform view", daemon=True).start()
+            self.loadtimer.start()
+        self.update()
+
+    def load(self, source):
+        try:
+            peaks = openpeaks(source)
+            try:
+                result = (peaks, WaveFile(source))
+            except Exception:
+                peaks.close()
+                raise
+        except Exception as error:
+            # anything, so the view reports it and stops polling instead of waiting forever
+            result = error
+        self.results.put((source, result))
+
+    def checkloaded(self):
+        while True:
+            try:
+                source, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if source != self.source or self.peaks is not None or self.error is not None:
+                # a source that was switched away from while it loaded
+                if not isinstance(result, Exception):
+                    for opened in result:
+                        opened.close()
+            elif isinstance(result, Exception):
+                self.error = f"Could not read {result}"
+            else:
+                self.peaks, self.wav = result
+                self.start, self.stop = 0, self.peaks.frames
+        if self.source is None or self.peaks is not None or self.error is not None:
+            self.loadtimer.stop()
+        self.update()
+
+    def closefiles(self):
+        if self.peaks is not None:
+            self.peaks.close()
+            self.wav.close()
+            self.peaks = self.wav = None
+
+    def columnpeaks(self, columns):
+        span = (self.stop - self.start) / columns
+        if span >= self.peaks.blockframes:
+            return self.peaks.peaks(self.start, self.stop, columns)
+        # zoomed past the finest level: a few hundred frames per column at most, read directly
+        channels = self.wav.read(self.start, self.stop - self.start).T
+        return reducecolumns(functools.reduce(np.minimum, channels), functools.reduce(np.maximum, channels), 0, span, columns)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(WAVEFORMBACKGROUND))
+        painter.setPen(QColor("white"))
+        if self.peaks is None or not self.peaks.frames:
+            text = self.error or (f"Preparing {os.path.basename(self.source)}..." if self.peaks is None else "Silent")
+            if self.source:
+                painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter | Qt.TextFlag.TextWordWrap, text)
+            return
+        columns = max(1, self.width())
+        lows, highs = self.columnpeaks(columns)
+        drawwaveform(painter, QRectF(self.rect()), lows, highs)
+        painter.setPen(QColor("white"))
+        rate = self.peaks.rate or 1
+        painter.drawText(QRectF(self.rect()).adjusted(4, 2, -4, -2), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+                         f"{self.start / rate:.2f}s - {self.stop / rate:.2f}s of {self.peaks.frames / rate:.2f}s, "
+                         f"{self.peaks.rate} Hz, {self.peaks.channels} ch")
+        painter.end()
+
+    def setrange(self, start, visible):
+        # keeps the view inside the file and at least a frame per pixel column
+        frames = self.peaks.frames
+        visible = int(min(frames, max(visible, min(frames, self.width()))))
+        start = int(min(max(0, start), frames - visible))
+        self.start, self.stop = start, start + visible
+        self.update()
+
+    def wheelEvent(self, event):
+        if self.peaks is None or not self.peaks.frames:
+            return
+        visible = self.stop - self.start
+        zoomed = visible / 1.25 ** (event.angleDelta().y() / 120)
+        anchor = event.position().x() / max(1, self.width())
+        self.setrange(self.start + visible * anchor - zoomed * anchor, zoomed)  # keeps the frame under the cursor
+
+    def mousePressEvent(self, event):
+        self.dragstart = (event.position().x(), self.start)
+
+    def mouseMoveEvent(self, event):
+        if self.dragstart is not None and self.peaks is not None:
+            x, start = self.dragstart
+            visible = self.stop - self.start
+            self.setrange(start - (event.position().x() - x) * visible / max(1, self.width()), visible)
+
+    def mouseReleaseEvent(self, event):
+        self.dragstart = None
+
+    def mouseDoubleClickEvent(self, event):
+        if self.peaks is not None:
+            self.setrange(0, self.peaks.frames)
+
+    def closeEvent(self, event):
+        self.loadtimer.stop()
+        self.closefiles()
+        super().closeEvent(event)
+
+class ThumbnailCache:
+    # Persistent LRU of rendered thumbnails, keyed by source path, mtime and size.
+    # Used from worker threads only.
+    def __init__(self, path, limit=THUMBCACHELIMIT):
+        self.path = path
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.entries = None  # key -> bytes on disk, least recently used first
+        self.total = 0
+
+    @staticmethod
+    def key(source, size):
+        stat = os.stat(source)
+        text = f"{os.path.abspath(source)}|{stat.st_mtime_ns}|{stat.st_size}|{size}"
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def filename(self, key):
+        return os.path.join(self.path, key + ".png")
+
+    def load(self):
+        if self.entries is not None:
+            return
+        self.entries = OrderedDict()
+        os.makedirs(self.path, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".png"):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total += size
+
+    def get(self, key):
+        with self.lock:
+            self.load()
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        filename = self.filename(key)
+        image = QImage(filename)
+        if image.isNull():
+            with self.lock:
+                self.total -= self.entries.pop(key, 0)
+            return None
+        try:
+            os.utime(filename)  # file mtime doubles as the last use time across sessions
+        except OSError:
+            pass
+        return image
+
+    def put(self, key, image):
+        with self.lock:
+            self.load()
+        filename = self.filename(key)
+        temp = filename + ".tmp"
+        if not image.save(temp, "PNG"):
+            return
+        os.replace(temp, filename)
+        size = os.path.getsize(filename)
+
+        evicted = []
+        with self.lock:
+            self.total -= self.entries.pop(key, 0)
+            self.entries[key] = size
+            self.total += size
+            while self.total > self.limit and len(self.entries) > 1:
+                oldkey, oldsize = self.entries.popitem(last=False)
+                self.total -= oldsize
+                evicted.append(oldkey)
+        for oldkey in evicted:
+            try:
+                os.remove(self.filename(oldkey))
+            except OSError:
+                pass
+
+class ThumbnailLoader:
+    # Renders thumbnails on a thread pool and hands finished QImages back on the UI thread
+    def __init__(self, cache, ready, size=THUMBSIZE, workers=THUMBWORKERS):
+        self.cache = cache
+        self.ready = ready  # called on the UI thread with {assetid: QImage or None}
+        self.size = size
+        self.workers = workers
+        self.pool = None  # started by the first request
+        self.results = queue.SimpleQueue()
+        self.pending = {}  # assetid -> (token, future), the token tells stale results apart
+
+        self.timer = QTimer()
+        self.timer.setInterval(THUMBPOLLMS)
+        self.timer.timeout.connect(self.drain)
+
+    def request(self, assetid, assettype, source):
+        if assetid in self.pending:
+            return
+        if self.pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thumbnails")
+        token = object()
+        self.pending[assetid] = (token, None)  # registered first, the worker may start right away
+        self.pending[assetid] = (token, self.pool.submit(self.render, token, assetid, assettype, source))
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def discard(self, assetid):
+        entry = self.pending.pop(assetid, None)
+        if entry is not None and entry[1] is not None:
+            entry[1].cancel()
+
+    def cancel(self):
+        for _, future in self.pending.values():
+            if future is not None:
+                future.cancel()
+        self.pending.clear()
+
+    def shutdown(self):
+        self.cancel()
+        self.timer.stop()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def live(self, assetid, token):
+        entry = self.pending.get(assetid)
+        return entry is not None and entry[0] is token
+
+    @profiled("ThumbnailLoader.render")
+    def render(self, token, assetid, assettype, source):
+        image = None
+        try:
+            if not self.live(assetid, token):
+                return
+            if assettype == "Material":
+                material = readmaterial(source) if source and os.path.isfile(source) else Material()
+                image = rendermaterialswatch(material, self.size)
+            elif source and os.path.isfile(source):
+                key = ThumbnailCache.key(source, self.size)
+                image = self.cache.get(key)
+                if image is None and self.live(assetid, token):
+                    if assettype == "Image":
+                        image = renderimagethumbnail(source, self.size)
+                    else:
+                        image = renderwaveformthumbnail(source, self.size)
+                    if image is not None:
+                        self.cache.put(key, image)
+        except Exception:
+            image = None  # whatever failed, the result below still goes out and the asset keeps its type icon
+        finally:
+            self.results.put((token, assetid, image))
+
+    def drain(self):
+        ready = {}
+        while True:
+            try:
+                token, assetid, image = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if self.live(assetid, token):
+                del self.pending[assetid]
+                ready[assetid] = image
+        if ready:
+            self.ready(ready)
+        if not self.pending:
+            self.timer.stop()
+
+def assettypeforpath(path, isdir):
+    if isdir:
+        return "Folder"
+    return EXTENSIONTYPES.get(os.path.splitext(path)[1].lower())
+
+class InotifyWatcher:
+    def __init__(self):
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = {}  # watch descriptor -> directory
+
+    def watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFYMASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self.paths[wd] = directory
+
+    def read(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+            offset += 16 + length
+            if mask & IN_Q_OVERFLOW:
+                events.append((None, mask, ""))
+                continue
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)
+                continue
+            directory = self.paths.get(wd)
+            if directory is not None:
+                events.append((directory, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+class ProjectScanner:
+    # Walks a project tree on a worker thread, streaming typed paths in batches, then keeps
+    # watching it: inotify where available, directory mtime polling otherwise. Only the
+    # directories that changed are ever listed again.
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.events = queue.SimpleQueue()  # ("add", [(path, type)]), ("remove", [path]), ("modify", [path]), ("scanned", mode)
+        self.stopped = threading.Event()
+        self.dirs = {}  # directory -> {name: isdir}, worker thread only
+        self.mtimes = {}  # directory -> mtime_ns, used when polling
+        self.watcher = None
+        self.pending = {"add": [], "remove": [], "modify": []}
+        self.thread = threading.Thread(target=self.run, name="projectscanner", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def emit(self, kind, item):
+        batch = self.pending[kind]
+        batch.append(item)
+        if len(batch) >= SCANBATCHSIZE:
+            self.flush()
+
+    def flush(self):
+        for kind, batch in self.pending.items():
+            if batch:
+                self.events.put((kind, batch))
+                self.pending[kind] = []
+
+    def run(self):
+        if sys.platform.startswith("linux"):
+            try:
+                self.watcher = InotifyWatcher()
+            except OSError:
+                self.watcher = None
+        try:
+            self.walk(self.root)
+            self.flush()
+            self.events.put(("scanned", "inotify" if self.watcher else "polling"))
+            if self.watcher is not None:
+                self.watchloop()
+            if self.watcher is None:
+                self.pollloop()  # also where watching ends up once walk() runs out of watches
+        finally:
+            if self.watcher is not None:
+                self.watcher.close()
+
+    def walk(self, top):
+        stack = [top]
+        while stack and not self.stopped.is_set():
+            directory = stack.pop()
+            if self.watcher is not None:
+                try:
+                    self.watcher.watch(directory)  # before listing, so nothing slips in between
+                except OSError:
+                    self.watcher.close()
+                    self.watcher = None  # out of watches, the poll loop covers everything
+            children = {}
+            try:
+                self.mtimes[directory] = os.stat(directory).st_mtime_ns
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name.startswith("."):
+                            continue
+                        isdir = entry.is_dir(follow_symlinks=False)
+                        children[entry.name] = isdir
+                        assettype = assettypeforpath(entry.name, isdir)
+                        if assettype:
+                            self.emit("add", (entry.path, assettype))
+                        if isdir:
+                            stack.append(entry.path)
+            except OSError:
+                pass
+            self.dirs[directory] = children
+
+    def created(self, directory, name, isdir):
+        children = self.dirs.get(directory)
+        if children is None or name in children or name.startswith("."):
+            return
+        children[name] = isdir
+        path = os.path.join(directory, name)
+        assettype = assettypeforpath(name, isdir)
+        if assettype:
+            self.emit("add", (path, assettype))
+        if isdir:
+            self.walk(path)
+
+    def deleted(self, directory, name):
+        children = self.dirs.get(directory)
+        if children is None or name not in children:
+            return
+        isdir = children.pop(name)
+        path = os.path.join(directory, name)
+        if isdir:
+            for childname in list(self.dirs.get(path, {})):
+                self.deleted(path, childname)
+            self.dirs.pop(path, None)
+            self.mtimes.pop(path, None)
+        if assettypeforpath(name, isdir):
+            self.emit("remove", path)
+
+    def refresh(self, directory):
+        # relist one directory and diff it against what we saw last time
+        try:
+            self.mtimes[directory] = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as entries:
+                current = {entry.name: entry.is_dir(follow_symlinks=False) for entry in entries}
+        except OSError:
+            parent, name = os.path.split(directory)
+            self.deleted(parent, name)
+            return
+        known = self.dirs.get(directory, {})
+        for name in [name for name in known if name not in current or known[name] != current[name]]:
+            self.deleted(directory, name)
+        for name, isdir in current.items():
+            if name not in known:
+                self.created(directory, name, isdir)
+
+    def watchloop(self):
+        while not self.stopped.is_set() and self.watcher is not None:
+            for directory, mask, name in self.watcher.read(0.25):
+                if directory is None:
+                    # kernel queue overflowed, reconcile each directory we know about
+                    for known in list(self.dirs):
+                        self.refresh(known)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    self.created(directory, name, bool(mask & IN_ISDIR))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.deleted(directory, name)
+                elif mask & IN_CLOSE_WRITE:
+                    path = os.path.join(directory, name)
+                    if assettypeforpath(name, False):
+                        self.emit("modify", path)
+            self.flush()
+
+    def pollloop(self):
+        # directory mtimes change on create/delete/rename, file edits are picked up by
+        # the thumbnail cache key instead
+        while not self.stopped.wait(SCANPOLLSECONDS):
+            for directory in list(self.dirs):
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                except OSError:
+                    mtime = None
+                if mtime != self.mtimes.get(directory):
+                    self.refresh(directory)
+            self.flush()
+
+def loadscriptcode(cachedir, key, path):
+    # compiled code lives on disk under the source hash, a miss compiles from the file
+    cachefile = os.path.join(cachedir, key + ".code")
+    try:
+        with open(cachefile, 'rb') as f:
+            return marshal.load(f), True
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    with open(path, 'rb') as f:
+        source = f.read()
+    code = compile(source, path, "exec")
+    cachefile = os.path.join(cachedir, scriptkey(source) + ".code")  # the file may have changed since it was hashed
+    temp = f"{cachefile}.{os.getpid()}.tmp"
+    try:
+        with open(temp, 'wb') as f:
+            marshal.dump(code, f)
+        os.replace(temp, cachefile)
+    except OSError:
+        pass
+    return code, False
+
+def scriptkey(source):
+    # marshalled code only loads on the interpreter that wrote it
+    return hashlib.sha1(sys.implementation.cache_tag.encode() + b"\0" + source).hexdigest()
+
+def scriptworker(connection, cachedir):
+    # Runs in a worker process: one request in, one reply out, until the editor hangs up
+    import io
+    import traceback
+    from contextlib import redirect_stdout, redirect_stderr
+    os.makedirs(cachedir, exist_ok=True)
+    while True:
+        try:
+            kind, key, path = connection.recv()
+        except (EOFError, OSError):
+            return
+        output = io.StringIO()
+        cached, error = False, None
+        try:
+            code, cached = loadscriptcode(cachedir, key, path)
+            if kind == "run":
+                with redirect_stdout(output), redirect_stderr(output):
+                    exec(code, {"__name__": "__main__", "__file__": path})
+        except SyntaxError as exc:
+            error = "".join(traceback.format_exception_only(exc))
+        except BaseException as exc:
+            # the worker's own frame is noise to whoever wrote the script
+            error = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__.tb_next))
+        try:
+            connection.send((cached, output.getvalue()[-SCRIPTOUTPUTLIMIT:], error))
+        except (OSError, ValueError):
+            return
+
+class ScriptWorker:
+    __slots__ = ('process', 'connection', 'job', 'deadline')
+
+    def __init__(self, process, connection):
+        self.process = process
+        self.connection = connection
+        self.job = None  # (kind, assetid, path, started) while busy
+        self.deadline = 0.0
+
+class ScriptRuntime:
+    # Runs Script assets in worker processes and polls their pipes from the UI thread, so a
+    # script that never returns costs the editor nothing until it is killed at its deadline.
+    def __init__(self, cachedir, finished, workers=SCRIPTWORKERS, timeout=SCRIPTTIMEOUTSECONDS):
+        self.cachedir = cachedir
+        self.finished = finished  # called with (kind, assetid, path, ok, output, error, seconds, cached)
+        self.maxworkers = workers
+        self.timeout = timeout
+        self.workers = []  # started lazily, a spawn costs an interpreter start
+        self.jobs = deque()  # (kind, assetid, path, key) waiting for a worker
+        self.keys = {}  # path -> (mtime_ns, size, source hash)
+        self.context = None
+
+        self.timer = QTimer()
+        self.timer.setInterval(SCRIPTPOLLMS)
+        self.timer.timeout.connect(self.poll)
+
+    def key(self, path):
+        # rehashes only files whose stat changed since the last look
+        stat = os.stat(path)
+        entry = self.keys.get(path)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2], False
+        with open(path, 'rb') as f:
+            key = scriptkey(f.read())
+        changed = entry is not None and entry[2] != key
+        self.keys[path] = (stat.st_mtime_ns, stat.st_size, key)
+        return key, changed
+
+    def run(self, assetid, path):
+        key, _ = self.key(path)
+        self.jobs.append(("run", assetid, path, key))
+        self.dispatch()
+
+    def reload(self, scripts):
+        # hot reload: scripts whose source hash moved are recompiled ahead of their next run
+        changed = 0
+        for assetid, path in scripts:
+            try:
+                key, moved = self.key(path)
+            except OSError:
+                continue
+            if moved:
+                self.jobs.append(("compile", assetid, path, key))
+                changed += 1
+        self.dispatch()
+        return changed
+
+    def spawn(self):
+        import multiprocessing
+        if self.context is None:
+            self.context = multiprocessing.get_context("spawn")  # fork would copy Qt and the worker threads
+        connection, child = self.context.Pipe()
+        process = self.context.Process(target=scriptworker, args=(child, self.cachedir), name="script worker", daemon=True)
+        process.start()
+        child.close()
+        worker = ScriptWorker(process, connection)
+        self.workers.append(worker)
+        return worker
+
+    def dispatch(self):
+        while self.jobs:
+            worker = next((worker for worker in self.workers if worker.job is None), None)
+            if worker is None:
+                if len(self.workers) >= self.maxworkers:
+                    break
+                worker = self.spawn()
+            kind, assetid, path, key = self.jobs.popleft()
+            now = time.perf_counter()
+            try:
+                worker.connection.send((kind, key, path))
+            except (OSError, ValueError):
+                self.kill(worker)
+                self.jobs.appendleft((kind, assetid, path, key))
+                continue
+            worker.job = (kind, assetid, path, now)
+            worker.deadline = now + self.timeout
+        if not self.timer.isActive() and (self.jobs or self.isbusy()):
+            self.timer.start()
+
+    def isbusy(self):
+        return any(worker.job is not None for worker in self.workers)
+
+    def poll(self):
+        now = time.perf_counter()
+        for worker in list(self.workers):
+            if worker.job is None:
+                continue
+            kind, assetid, path, started = worker.job
+            try:
+                if worker.connection.poll():
+                    cached, output, error = worker.connection.recv()
+                    worker.job = None
+                    self.finished(kind, assetid, path, error is None, output, error, now - started, cached)
+                    continue
+            except (EOFError, OSError):
+                self.kill(worker)
+                self.finished(kind, assetid, path, False, "", "Script worker exited unexpectedly", now - started, False)
+                continue
+            if now > worker.deadline:
+                self.kill(worker)
+                self.finished(kind, assetid, path, False, "", f"Stopped after {self.timeout:g} s", now - started, False)
+        self.dispatch()
+        if not self.jobs and not self.isbusy():
+            self.timer.stop()
+
+    def kill(self, worker):
+        worker.process.kill()
+        worker.process.join(1)
+        worker.connection.close()
+        self.workers.remove(worker)
+
+    def stop(self):
+        # drops queued jobs and kills workers mid-run, idle ones are kept
+        self.jobs.clear()
+        stopped = 0
+        for worker in list(self.workers):
+            if worker.job is not None:
+                self.kill(worker)
+                stopped += 1
+        self.timer.stop()
+        return stopped
+
+    def shutdown(self):
+        self.jobs.clear()
+        self.timer.stop()
+        for worker in list(self.workers):
+            if worker.job is None:
+                worker.connection.close()  # the worker sees EOF and returns
+                worker.process.join(1)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join(1)
+        self.workers.clear()
+
+class AssetTable:
+    # Compact storage for every asset, an asset id is its slot in these columns.
+    # A removed asset keeps its id reserved until release(), so undo can bring it back
+    # under the same id.
+    def __init__(self):
+        self.names = []  # None for removed assets
+        self.types = array('B')  # index into ASSETTYPES
+        self.filelocs = []
+        self.parents = array('i')  # folder id holding the asset, ROOTFOLDER at the top
+        self.free = set()  # released ids, reusable by add()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, assettype, name, fileloc="", parent=ROOTFOLDER):
+        typecode = ASSETTYPES.index(assettype)
+        if self.free:
+            assetid = self.free.pop()
+        else:
+            assetid = len(self.names)
+            self.reserve(assetid + 1)
+        self.parents[assetid] = parent
+        self.restore(assetid, typecode, name, fileloc)
+        return assetid
+
+    def addrecords(self, records, parent=ROOTFOLDER):
+        # (typecode, name, fileloc) records in one go, fresh slots are appended as whole columns
+        ids = [self.free.pop() for _ in range(min(len(self.free), len(records)))]
+        for assetid, (typecode, name, fileloc) in zip(ids, records):
+            self.parents[assetid] = parent
+            self.restore(assetid, typecode, name, fileloc)
+        rest = records[len(ids):]
+        if rest:
+            start = len(self.names)
+            typecodes, names, filelocs = zip(*rest)
+            self.names.extend(names)
+            self.types.extend(typecodes)
+            self.filelocs.extend(filelocs)
+            self.parents.extend([parent] * len(rest))
+            self.count += len(rest)
+            ids.extend(range(start, start + len(rest)))
+        return ids
+
+    def reserve(self, size):
+        # grows the columns to size; the new ids stay unused but are not handed out by add()
+        grow = size - len(self.names)
+        if grow > 0:
+            self.names.extend([None] * grow)
+            self.types.extend(bytes(grow))
+            self.filelocs.extend([None] * grow)
+            self.parents.extend([ROOTFOLDER] * grow)
+
+    def clear(self):
+        self.names = []
+        self.types = array('B')
+        self.filelocs = []
+        self.parents = array('i')
+        self.free = set()
+        self.count = 0
+
+    def place(self, records):
+        # (id, parent, typecode, name, fileloc) records put back under their own ids
+        self.reserve(max((record[0] for record in records), default=-1) + 1)
+        names, types, filelocs, parents = self.names, self.types, self.filelocs, self.parents
+        for assetid, parent, typecode, name, fileloc in records:
+            self.free.discard(assetid)
+            names[assetid] = name
+            types[assetid] = typecode
+            filelocs[assetid] = fileloc
+            parents[assetid] = parent
+        self.count += len(records)
+
+    def restore(self, assetid, typecode, name, fileloc=""):
+        self.names[assetid] = name
+        self.types[assetid] = typecode
+        self.filelocs[assetid] = fileloc
+        self.count += 1
+
+    def remove(self, assetid):
+        self.names[assetid] = None
+        self.filelocs[assetid] = None
+        self.count -= 1
+
+    def release(self, assetid):
+        if self.names[assetid] is None:
+            self.free.add(assetid)
+
+    def isalive(self, assetid):
+        return self.names[assetid] is not None
+
+    def record(self, assetid):
+        return self.types[assetid], self.names[assetid], self.filelocs[assetid]
+
+    def typeof(self, assetid):
+        return ASSETTYPES[self.types[assetid]]
+
+class FolderTree:
+    # Parent/child links between assets. A folder gets a children list once its contents are
+    # loaded, folders further down stay unloaded until they are opened. Folders are indexed by
+    # (parent, name), so resolving a path is one dict lookup per level whatever the tree holds,
+    # and moving a folder only relinks it, its subtree travels along untouched.
+    def __init__(self, table):
+        self.table = table
+        self.children = {ROOTFOLDER: []}  # folder id -> child ids in listing order, loaded folders only
+        self.folders = {}  # (parent id, name) -> folder id
+
+    def isloaded(self, folderid):
+        return folderid in self.children
+
+    def isfolder(self, assetid):
+        return self.table.types[assetid] == FOLDERTYPECODE
+
+    def adopt(self, assetids, parent):
+        # ids now listed under parent: records the link and indexes folder names
+        table = self.table
+        for assetid in assetids:
+            if table.types[assetid] == FOLDERTYPECODE:
+                self.unindex(assetid)
+                self.folders[(parent, table.names[assetid])] = assetid
+            table.parents[assetid] = parent
+
+    def created(self, assetids):
+        # folders that are new to the tree start out loaded and empty
+        for assetid in assetids:
+            if self.isfolder(assetid) and assetid not in self.children:
+                self.children[assetid] = []
+
+    def unindex(self, assetid):
+        key = (self.table.parents[assetid], self.table.names[assetid])
+        if self.folders.get(key) == assetid:
+            del self.folders[key]
+
+    def rename(self, assetid, name):
+        if self.isfolder(assetid):
+            self.unindex(assetid)
+            self.folders[(self.table.parents[assetid], name)] = assetid
+
+    def insert(self, parent, entries):
+        # entries: (position, asset id) sorted by position, for a folder the view isn't showing
+        children = self.children[parent]
+        if entries and entries[0][0] >= len(children):
+            children.extend(assetid for _, assetid in entries)
+        else:
+            children[:] = mergepositions(children, entries)
+        self.adopt([assetid for _, assetid in entries], parent)
+
+    def detach(self, assetids):
+        # takes the ids out of their folders' children lists
+        byparent = {}
+        for assetid in assetids:
+            byparent.setdefault(self.table.parents[assetid], set()).add(assetid)
+        for parent, gone in byparent.items():
+            children = self.children.get(parent)
+            if children is not None:
+                children[:] = [assetid for assetid in children if assetid not in gone]
+
+    def forget(self, assetids):
+        # ids leaving the project: folders drop out of the name index along with their children lists
+        for assetid in assetids:
+            if self.isfolder(assetid):
+                self.unindex(assetid)
+                self.children.pop(assetid, None)
+
+    def find(self, path, load=None):
+        # folder id for a "A/B/C" path, None if there is no such folder; load(folder) is
+        # called on each level first so unloaded folders can be filled in on the way down
+        folderid = ROOTFOLDER
+        for name in path.split("/"):
+            if not name:
+                continue
+            if load is not None:
+                load(folderid)
+            folderid = self.folders.get((folderid, name))
+            if folderid is None:
+                return None
+        return folderid
+
+    def path(self, folderid):
+        names = []
+        while folderid != ROOTFOLDER:
+            names.append(self.table.names[folderid])
+            folderid = self.table.parents[folderid]
+        return "/".join(reversed(names))
+
+    def contains(self, folderid, assetid):
+        # whether assetid sits somewhere below folderid
+        while assetid != ROOTFOLDER:
+            assetid = self.table.parents[assetid]
+            if assetid == folderid:
+                return True
+        return False
+
+    def descendants(self, folderids):
+        # every id below the folders, each with its position in its own folder; loaded levels only
+        found = []
+        stack = list(folderids)
+        while stack:
+            children = self.children.get(stack.pop(), ())
+            for position, assetid in enumerate(children):
+                found.append((assetid, position))
+                if self.isfolder(assetid):
+                    stack.append(assetid)
+        return found
+
+class UndoCommand:
+    __slots__ = ("kind", "records", "folder", "stamp", "size")
+
+    def __init__(self, kind, records, folder, stamp):
+        self.kind = kind
+        self.records = records
+        self.folder = folder  # folder the edit was made in, undo and redo go back there
+        self.stamp = stamp
+        self.size = 0
+
+def commandids(command):
+    # "add": [(id, type, name, fileloc)], "delete": groups of [(id, position, type, name, fileloc)],
+    # "rename"/"fileloc": [(id, old, new)], "move": [(id, old position, new position)],
+    # "reparent": [(id, old position, new folder, new position)]; the folder it was made in
+    # is held like its assets, undo goes back there
+    if command.kind == "delete":
+        assetids = [record[0] for group in command.records for record in group]
+    else:
+        assetids = [record[0] for record in command.records]
+    if command.folder != ROOTFOLDER:
+        assetids.append(command.folder)
+    return assetids
+
+def recordsbytes(kind, records):
+    # rough bytes held: a fixed cost per record plus its strings
+    if kind == "delete":
+        records = [record for group in records for record in group]
+    return sum(UNDORECORDBYTES + sum(len(field) for field in record if isinstance(field, str)) for record in records)
+
+class UndoHistory:
+    # Undo/redo stacks of compact asset deltas, bounded by entry count and bytes.
+    # Renaming or relocating the same asset again within mergeseconds is folded into one step.
+    def __init__(self, table, maxentries=UNDOMAXENTRIES, maxbytes=UNDOMAXBYTES, mergeseconds=UNDOMERGESECONDS):
+        self.table = table
+        self.maxentries = maxentries
+        self.maxbytes = maxbytes
+        self.mergeseconds = mergeseconds
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.bytes = 0
+        self.references = {}  # asset id -> number of records naming it
+
+    def __len__(self):
+        return len(self.undo_stack)
+
+    def push(self, kind, records, folder=ROOTFOLDER):
+        if not records:
+            return
+        self.clearredo()
+        now = time.monotonic()
+        top = self.undo_stack[-1] if self.undo_stack else None
+        if top is not None and now - top.stamp < self.mergeseconds and top.folder == folder and self.merge(top, kind, records):
+            top.stamp = now
+        else:
+            command = UndoCommand(kind, records, folder, now)
+            command.size = UNDOCOMMANDBYTES + recordsbytes(kind, records)
+            self.bytes += command.size
+            self.reference(commandids(command))
+            self.undo_stack.append(command)
+        self.trim()
+
+    def merge(self, top, kind, records):
+        # only edits of one field of one asset; adds, deletes and moves each stay their own step
+        if top.kind != kind or kind not in ("rename", "fileloc"):
+            return False
+        (assetid, old, _), = top.records
+        (otherid, _, new), = records
+        if assetid != otherid:
+            return False
+        top.records = [(assetid, old, new)]
+        size = UNDOCOMMANDBYTES + recordsbytes(kind, top.records)
+        self.bytes += size - top.size
+        top.size = size
+        return True
+
+    def reference(self, assetids):
+        for assetid in assetids:
+            self.references[assetid] = self.references.get(assetid, 0) + 1
+
+    def drop(self, command):
+        self.bytes -= command.size
+        for assetid in commandids(command):
+            count = self.references.get(assetid, 0) - 1
+            if count > 0:
+                self.references[assetid] = count
+                continue
+            self.references.pop(assetid, None)
+            self.table.release(assetid)  # only frees ids whose asset is gone for good
+
+    def isreferenced(self, assetid):
+        return assetid in self.references
+
+    def trim(self):
+        while self.undo_stack and (len(self.undo_stack) > self.maxentries or self.bytes > self.maxbytes):
+            self.drop(self.undo_stack.popleft())
+
+    def clearredo(self):
+        for command in self.redo_stack:
+            self.drop(command)
+        self.redo_stack.clear()
+
+    def clear(self):
+        self.clearredo()
+        while self.undo_stack:
+            self.drop(self.undo_stack.popleft())
+
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        self.redo_stack.append(command)
+        return command
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        self.undo_stack.append(command)
+        return command
+
+def mergepositions(base, entries):
+    # base with each (position, item) of the sorted entries put back at that final position
+    merged = []
+    taken = 0
+    for inserted, (position, item) in enumerate(entries):
+        upto = position - inserted
+        merged.extend(base[taken:upto])
+        taken = max(taken, upto)
+        merged.append(item)
+    merged.extend(base[taken:])
+    return merged
+
+def rowruns(rows):
+    # (start, count) for each run of consecutive rows in a sorted list
+    start = previous = None
+    for row in rows:
+        if previous is not None and row == previous + 1:
+            previous = row
+            continue
+        if start is not None:
+            yield start, previous - start + 1
+        start = previous = row
+    if start is not None:
+        yield start, previous - start + 1
+
+def encodeassets(records):
+    # Clipboard payload for (typecode, name, fileloc) records: a header, then the type codes,
+    # name and fileloc byte lengths (-1 for no fileloc) and the utf-8 text, column by column
+    names = [name.encode() for _, name, _ in records]
+    filelocs = [fileloc.encode() if fileloc is not None else None for _, _, fileloc in records]
+    return b"".join((
+        struct.pack("<4sBI", CLIPBOARDMAGIC, CLIPBOARDVERSION, len(records)),
+        bytes(typecode for typecode, _, _ in records),
+        array('i', map(len, names)).tobytes(),
+        array('i', (-1 if fileloc is None else len(fileloc) for fileloc in filelocs)).tobytes(),
+        *names,
+        *(fileloc for fileloc in filelocs if fileloc is not None),
+    ))
+
+def decodeassets(data):
+    # records back from encodeassets(), None if the payload isn't one we understand
+    try:
+        magic, version, count = struct.unpack_from("<4sBI", data)
+        offset = struct.calcsize("<4sBI")
+        if magic != CLIPBOARDMAGIC or version != CLIPBOARDVERSION:
+            return None
+        typecodes = data[offset:offset + count]
+        offset += count
+        namelengths = array('i', data[offset:offset + 4 * count])
+        offset += 4 * count
+        loclengths = array('i', data[offset:offset + 4 * count])
+        offset += 4 * count
+        if len(typecodes) != count or len(namelengths) != count or len(loclengths) != count:
+            return None
+        if any(typecode >= len(ASSETTYPES) for typecode in typecodes):
+            return None
+        names = []
+        for length in namelengths:
+            names.append(data[offset:offset + length].decode())
+            offset += length
+        filelocs = []
+        for length in loclengths:
+            if length < 0:
+                filelocs.append(None)
+            else:
+                filelocs.append(data[offset:offset + length].decode())
+                offset += length
+        if offset != len(data):
+            return None
+    except (struct.error, ValueError):
+        return None
+    return list(zip(typecodes, names, filelocs))
+
+class ProjectFile:
+    # Binary project file: header, folder table, fixed-size asset records grouped by parent
+    # folder, then a utf-8 string table for names and file locations. Opening only maps the
+    # file, a folder's records are decoded when children() asks for them.
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()  # the journal writer remaps the file while folders are read from it
+        self.map()
+
+    def map(self):
+        with open(self.path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, _, self.generation, self.idlimit, self.recordcount, self.foldercount,
+             self.foldersoffset, self.recordsoffset, self.stringsoffset, _) = PROJECTHEADER.unpack_from(self.data)
+        except struct.error:
+            magic = version = None
+        if magic != PROJECTMAGIC or version != PROJECTVERSION:
+            self.data.close()
+            raise ValueError(f"{self.path} is not a project file")
+
+    @contextmanager
+    def unmapped(self):
+        # Windows will not replace a file that is mapped, so the mapping is let go while the
+        # file is swapped and taken again on the new one; readers wait until then
+        with self.lock:
+            self.data.close()
+            try:
+                yield
+            finally:
+                self.map()
+
+    def close(self):
+        self.data.close()
+
+    def folderspan(self, folderid):
+        # binary search of the folder table, which is sorted by folder id
+        low, high = 0, self.foldercount
+        while low < high:
+            middle = (low + high) // 2
+            entryid, first, count = PROJECTFOLDER.unpack_from(self.data, self.foldersoffset + middle * PROJECTFOLDER.size)
+            if entryid == folderid:
+                return first, count
+            if entryid < folderid:
+                low = middle + 1
+            else:
+                high = middle
+        return 0, 0
+
+    def children(self, folderid=ROOTFOLDER):
+        # (file id, typecode, name, fileloc) for the folder's assets, in listing order
+        with self.lock:
+            first, count = self.folderspan(folderid)
+            records = self.decode(first, count)
+        return [(fileid, typecode, name, fileloc) for fileid, _, typecode, name, fileloc in records]
+
+    def records(self):
+        # every (file id, parent, typecode, name, fileloc), folder by folder
+        with self.lock:
+            return self.decode(0, self.recordcount)
+
+    def decode(self, first, count):
+        start = self.recordsoffset + first * PROJECTRECORD.size
+        records = memoryview(self.data)[start:start + count * PROJECTRECORD.size]
+        data, strings = self.data, self.stringsoffset
+        decoded = []
+        for fileid, parent, typecode, nameoffset, namelength, locoffset, loclength in PROJECTRECORD.iter_unpack(records):
+            name = data[strings + nameoffset:strings + nameoffset + namelength].decode()
+            fileloc = None if loclength < 0 else data[strings + locoffset:strings + locoffset + loclength].decode()
+            decoded.append((fileid, parent, typecode, name, fileloc))
+        records.release()
+        return decoded
+
+    @staticmethod
+    def save(path, records, generation=0, mapped=None):
+        # records: (file id, parent folder id, typecode, name, fileloc) in listing order;
+        # mapped is an open ProjectFile of path, unmapped while the new file takes its place
+        records = sorted(records, key=lambda record: record[1])  # stable, keeps listing order per folder
+        folders = []
+        strings = bytearray()
+        packed = bytearray(len(records) * PROJECTRECORD.size)
+        for index, (fileid, parent, typecode, name, fileloc) in enumerate(records):
+            if not folders or folders[-1][0] != parent:
+                folders.append([parent, index, 0])
+            folders[-1][2] += 1
+            name = name.encode()
+            nameoffset = len(strings)
+            strings += name
+            if fileloc is None:
+                locoffset, loclength = 0, -1
+            else:
+                fileloc = fileloc.encode()
+                locoffset, loclength = len(strings), len(fileloc)
+                strings += fileloc
+            PROJECTRECORD.pack_into(packed, index * PROJECTRECORD.size,
+                                    fileid, parent, typecode, nameoffset, len(name), locoffset, loclength)
 
-from PyQt6.QtWidgets import (
-    QApplication, QMainWindow, QTextEdit, QFrame, QSplitter, QSplitterHandle,
-    QLabel, QWidget, QMenu, QListWidget
-)
-from PyQt6.QtCore import Qt, QSize, QTimer
-from PyQt6.QtGui import QAction, QIcon, QIntValidator, QKeyEvent, QPainter
-from PyQt6.QtWidgets import QListWidgetItem, QLineEdit, QVBoxLayout, QComboBox, QFormLayout
+        foldersoffset = PROJECTHEADER.size
+        recordsoffset = foldersoffset + len(folders) * PROJECTFOLDER.size
+        stringsoffset = recordsoffset + len(packed)
+        idlimit = max((record[0] for record in records), default=-1) + 1
+        header = PROJECTHEADER.pack(PROJECTMAGIC, PROJECTVERSION, 0, generation, idlimit, len(records), len(folders),
+                                    foldersoffset, recordsoffset, stringsoffset, len(strings))
+        temppath = path + ".tmp"
+        with open(temppath, "wb") as file:
+            file.write(header)
+            file.write(b"".join(PROJECTFOLDER.pack(*folder) for folder in folders))
+            file.write(packed)
+            file.write(strings)
+        with mapped.unmapped() if mapped is not None else nullcontext():
+            os.replace(temppath, path)  # a crash mid-save leaves the old file intact
 
-assetspath = 'assets'
+def readjournal(path):
+    # (generation, changes, end of the last intact frame); a torn or corrupt tail is where it stops
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None, [], 0
+    try:
+        magic, generation = JOURNALHEADER.unpack_from(data)
+    except struct.error:
+        return None, [], 0
+    if magic != JOURNALMAGIC:
+        return None, [], 0
+    changes = []
+    offset = end = JOURNALHEADER.size
+    while offset + JOURNALFRAME.size <= len(data):
+        length, checksum = JOURNALFRAME.unpack_from(data, offset)
+        payload = data[offset + JOURNALFRAME.size:offset + JOURNALFRAME.size + length]
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            break
+        try:
+            changes.append(marshal.loads(payload))
+        except (EOFError, ValueError, TypeError):
+            break
+        offset = end = offset + JOURNALFRAME.size + length
+    return generation, changes, end
 
-if not os.path.exists(assetspath):
-    os.makedirs(assetspath)
+def loadrecords(decoded):
+    # (id, parent, typecode, name, fileloc) records -> records by id and each folder's children in order
+    records = {}
+    children = {ROOTFOLDER: []}
+    for assetid, parent, typecode, name, fileloc in decoded:
+        records[assetid] = (parent, typecode, name, fileloc)
+        children.setdefault(parent, []).append(assetid)
+    return records, children
 
-folderimgassetpath = os.path.join(assetspath, "FOLDER.png")
-scriptimgassetpath = os.path.join(assetspath, "SCRIPT.png")
-matimgassetpath = os.path.join(assetspath, "MATERIAL.png")
-audioimgassetpath = os.path.join(assetspath, "AUDIO.png")
-photoimgassetpath = os.path.join(assetspath, "IMAGE.png")
+def placeinto(children, parent, entries):
+    # entries: (position, asset id) sorted by position
+    listing = children.setdefault(parent, [])
+    if entries[0][0] >= len(listing):
+        listing.extend(assetid for _, assetid in entries)  # appended, the usual case
+    else:
+        listing[:] = mergepositions(listing, entries)
 
-ICONSIZE = 64
+def takeout(records, children, assetids):
+    byparent = {}
+    for assetid in assetids:
+        if assetid in records:
+            byparent.setdefault(records[assetid][0], set()).add(assetid)
+    for parent, gone in byparent.items():
+        listing = children.get(parent, [])
+        listing[:] = [assetid for assetid in listing if assetid not in gone]
 
-class Viewport(QFrame):
-    def __init__(self):
-        super().__init__()
-        self.setStyleSheet("background-color: black;")
-        self.objects = []  # store drawable objects
+def applychange(change, records, children):
+    # replays one journal change onto records (id -> (parent, typecode, name, fileloc)) and the
+    # children lists of each folder
+    kind = change[0]
+    if kind == "insert":
+        _, parent, entries = change
+        for _, assetid, typecode, name, fileloc in entries:
+            records[assetid] = (parent, typecode, name, fileloc)
+        placeinto(children, parent, [(position, assetid) for position, assetid, *_ in entries])
+    elif kind == "remove":
+        takeout(records, children, change[1])
+        for assetid in change[1]:
+            records.pop(assetid, None)
+            children.pop(assetid, None)
+    elif kind == "move":
+        _, parent, entries = change
+        moving = {assetid for _, assetid in entries}
+        listing = children.setdefault(parent, [])
+        listing[:] = mergepositions([assetid for assetid in listing if assetid not in moving], entries)
+    elif kind == "reparent":
+        _, parent, entries = change
+        takeout(records, children, [assetid for _, assetid in entries])
+        for _, assetid in entries:
+            if assetid in records:
+                records[assetid] = (parent, *records[assetid][1:])
+        placeinto(children, parent, entries)
+    elif kind in ("rename", "fileloc"):
+        _, assetid, value = change
+        if assetid in records:
+            parent, typecode, name, fileloc = records[assetid]
+            records[assetid] = (parent, typecode, value, fileloc) if kind == "rename" else (parent, typecode, name, value)
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+def reachable(records, children):
+    # (id, parent, typecode, name, fileloc) for everything hanging off the root, folder by folder
+    found = []
+    stack = [ROOTFOLDER]
+    while stack:
+        parent = stack.pop()
+        for assetid in children.get(parent, ()):
+            record = records[assetid]
+            found.append((assetid, *record))
+            if record[1] == FOLDERTYPECODE:
+                stack.append(assetid)
+    return found
 
-        # Example: draw objects
-        for obj in self.objects:
-            painter.setBrush(obj['color'])
-            painter.drawRect(obj['x'], obj['y'], obj['w'], obj['h'])
+class ProjectJournal:
+    # Append-only log of edits made since the project snapshot was written. append() only
+    # queues the change; a writer thread frames, writes and fsyncs whatever has queued up in
+    # one go (group commit), and folds the journal back into the snapshot when it grows big
+    # or the editor has been idle for a while.
+    def __init__(self, projectpath, generation, project=None):
+        self.projectpath = projectpath
+        self.project = project  # the editor's mapped ProjectFile of projectpath, if any
+        self.path = projectpath + JOURNALEXTENSION
+        self.generation = generation
+        self.changes = queue.SimpleQueue()
+        self.error = None  # last write error, the editor shows it on the next save
+        journalgeneration, _, end = readjournal(self.path)
+        if journalgeneration == generation:
+            self.file = open(self.path, "r+b")
+            self.file.truncate(end)  # drops a torn tail so new frames follow intact ones
+            self.file.seek(end)
+        else:
+            self.file = self.create(generation)
+        self.size = self.file.tell()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
 
-        painter.end()
+    def append(self, change):
+        self.changes.put(change)
 
-class CustomSplitterHandle(QSplitterHandle):
-    def __init__(self, orientation, parent):
-        super().__init__(orientation, parent)
+    def compact(self):
+        self.changes.put(("compact",))
 
-    def mousePressEvent(self, event):
-        if event.button() == Qt.MouseButton.RightButton:
-            self.parent().reset_sizes()
-        super().mousePressEvent(event)
+    def close(self):
+        self.changes.put(None)
+        self.thread.join()
 
-class CustomSplitter(QSplitter):
-    def __init__(self, orientation, parent=None, reset_sizes=None):
-        super().__init__(orientation, parent)
-        self.reset_sizes_list = reset_sizes
-        self.setHandleWidth(2)
+    def create(self, generation):
+        temppath = self.path + ".tmp"
+        with open(temppath, "wb") as file:
+            file.write(JOURNALHEADER.pack(JOURNALMAGIC, generation))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temppath, self.path)
+        file = open(self.path, "r+b")
+        file.seek(0, os.SEEK_END)
+        return file
 
-    def createHandle(self):
-        return CustomSplitterHandle(self.orientation(), self)
+    def run(self):
+        while True:
+            try:
+                change = self.changes.get(timeout=JOURNALIDLESECONDS)
+            except queue.Empty:
+                if self.size > JOURNALHEADER.size:
+                    self.trycompact()
+                continue
+            batch = [change]
+            while True:
+                try:
+                    batch.append(self.changes.get_nowait())
+                except queue.Empty:
+                    break
+            frames = []
+            stop = compact = False
+            for change in batch:
+                if change is None:
+                    stop = True
+                elif change[0] == "compact":
+                    compact = True
+                else:
+                    payload = marshal.dumps(change)
+                    frames.append(JOURNALFRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+            if frames:
+                try:
+                    data = b"".join(frames)
+                    self.file.write(data)
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                    self.size += len(data)
+                except OSError as error:
+                    self.error = error
+            if compact or self.size > JOURNALCOMPACTBYTES:
+                self.trycompact()
+            if stop:
+                self.file.close()
+                return
 
-    def reset_sizes(self):
-        if self.reset_sizes_list:
-            self.setSizes(self.reset_sizes_list)
+    def trycompact(self):
+        try:
+            self.compactnow()
+        except (OSError, ValueError) as error:
+            self.error = error
+
+    def compactnow(self):
+        # snapshot + journal -> new snapshot one generation on, then a fresh journal for it. A crash
+        # between the two replaces leaves a journal of the old generation, which loading ignores.
+        project = ProjectFile(self.projectpath)
+        try:
+            records, children = loadrecords(project.records())
+        finally:
+            project.close()
+        _, changes, _ = readjournal(self.path)
+        for change in changes:
+            applychange(change, records, children)
+        generation = self.generation + 1
+        ProjectFile.save(self.projectpath, reachable(records, children), generation, self.project)
+        file = self.create(generation)
+        self.file.close()
+        self.file = file
+        self.generation = generation
+        self.size = self.file.tell()
+
+class AssetIndex:
+    # Trigram index over lowercased asset names plus a per-type index, kept current
+    # as assets enter and leave the listing so searching never scans every name.
+    # Added ids are only queued; the model indexes them in idle time, and the index catches
+    # up on whatever is left the first time it is read or changed.
+    def __init__(self, table):
+        self.table = table
+        self.lowernames = {}  # asset id -> lowercased name, for every indexed asset
+        self.trigrams = {}  # trigram -> set of asset ids
+        self.bytype = {}  # type code -> set of asset ids
+        self.pending = []  # ids added but not indexed yet
+
+    @staticmethod
+    def grams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, assetid):
+        self.extend((assetid,))
+
+    def clear(self):
+        self.lowernames = {}
+        self.trigrams = {}
+        self.bytype = {}
+        self.pending = []
+
+    def extend(self, assetids):
+        self.pending.extend(assetids)
+
+    def catchup(self, deadline=None):
+        # indexes everything queued, or only what fits before deadline (a perf_counter time)
+        pending = self.pending
+        names, types = self.table.names, self.table.types
+        lowernames, trigrams, bytype = self.lowernames, self.trigrams, self.bytype
+        while pending:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            assetids = pending[-INDEXCHUNKSIZE:]
+            del pending[-INDEXCHUNKSIZE:]
+            for assetid in assetids:
+                name = (names[assetid] or "").lower()
+                lowernames[assetid] = name
+                for gram in {name[i:i + 3] for i in range(len(name) - 2)}:
+                    ids = trigrams.get(gram)
+                    if ids is None:
+                        ids = trigrams[gram] = set()
+                    ids.add(assetid)
+                typecode = types[assetid]
+                ids = bytype.get(typecode)
+                if ids is None:
+                    ids = bytype[typecode] = set()
+                ids.add(assetid)
+
+    def remove(self, assetid):
+        self.catchup()
+        name = self.lowernames.pop(assetid, None)
+        if name is None:
+            return
+        for gram in self.grams(name):
+            ids = self.trigrams.get(gram)
+            if ids is not None:
+                ids.discard(assetid)
+                if not ids:
+                    del self.trigrams[gram]
+        self.bytype.get(self.table.types[assetid], set()).discard(assetid)
+
+    def discard(self, assetids):
+        # ids still queued are simply dropped from the queue
+        if self.pending:
+            self.pending = [assetid for assetid in self.pending if assetid not in assetids]
+        for assetid in assetids:
+            self.remove(assetid)
+
+    def rename(self, assetid, name):
+        self.catchup()
+        if assetid not in self.lowernames:
+            return
+        old = self.lowernames[assetid]
+        new = name.lower()
+        self.lowernames[assetid] = new
+        oldgrams, newgrams = self.grams(old), self.grams(new)
+        for gram in oldgrams - newgrams:
+            ids = self.trigrams.get(gram)
+            if ids is not None:
+                ids.discard(assetid)
+                if not ids:
+                    del self.trigrams[gram]
+        for gram in newgrams - oldgrams:
+            self.trigrams.setdefault(gram, set()).add(assetid)
+
+    def search(self, text, typecode=None):
+        self.catchup()
+        if len(text) >= 3:
+            sets = sorted((self.trigrams.get(gram, ()) for gram in self.grams(text)), key=len)
+            candidates = set(sets[0]).intersection(*sets[1:])
+            if typecode is not None:
+                candidates &= self.bytype.get(typecode, set())
+        elif typecode is not None:
+            candidates = self.bytype.get(typecode, set())
+        else:
+            candidates = self.lowernames.keys()
+        if not text:
+            return set(candidates)
+        # trigrams only narrow things down, the substring test is what decides
+        lowernames = self.lowernames
+        return {assetid for assetid in candidates if text in lowernames[assetid]}
+
+class AssetModel(QAbstractListModel):
+    edited = pyqtSignal(int, object, object, object)  # asset id, role, old value, new value
+    moverequested = pyqtSignal(list, int)  # asset ids, listing position
+    reparentrequested = pyqtSignal(list, int)  # asset ids, folder id they were dropped onto
+
+    def __init__(self, table, parent=None):
+        super().__init__(parent)
+        self.table = table
+        self.tree = FolderTree(table)
+        self.folder = ROOTFOLDER  # the folder shown, only its children are in the model
+        self.listing = self.tree.children[ROOTFOLDER]  # asset ids in display order
+        self.rows = self.listing  # what the view sees, the listing itself unless a filter is set
+        self.filter = ("", None)  # lowercased search text, type code
+        self.searchindex = AssetIndex(table)
+        self.indextimer = QTimer()  # indexes queued names while the event loop is idle
+        self.indextimer.timeout.connect(self.indexchunk)
+        self.thumbnails = OrderedDict()  # asset id -> QIcon, or None when there is no preview
+        self.thumbnailer = ThumbnailLoader(ThumbnailCache(thumbcachepath), self.thumbnailsready)
+        self.modelAboutToBeReset.connect(self.thumbnailer.cancel)  # leaving a folder drops its queue
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        assetid = self.rows[index.row()]
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self.table.names[assetid]
+        if role == Qt.ItemDataRole.DecorationRole:
+            assettype = self.table.typeof(assetid)
+            if assettype in THUMBNAILTYPES:
+                thumbnail = self.thumbnail(assetid, assettype)
+                if thumbnail is not None:
+                    return thumbnail
+            return iconregistry.icon(assettype)
+        if role == Qt.ItemDataRole.UserRole:
+            return self.table.typeof(assetid)
+        if role == Qt.ItemDataRole.UserRole + 1:
+            if self.table.typeof(assetid) in FILEASSETTYPES:
+                return self.table.filelocs[assetid]
+            return None
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.EditRole, Qt.ItemDataRole.UserRole + 1):
+            return False
+        assetid = self.rows[index.row()]
+        old = self.table.names[assetid] if role == Qt.ItemDataRole.EditRole else self.table.filelocs[assetid]
+        if value == old:
+            return True
+        self.applyedit(assetid, role, value, index.row())
+        self.edited.emit(assetid, role, old, value)
+        return True
+
+    def applyedit(self, assetid, role, value, row=None):
+        # the one place names and file locations change, user edits and undo/redo alike
+        if role == Qt.ItemDataRole.EditRole:
+            self.searchindex.rename(assetid, value)
+            self.tree.rename(assetid, value)
+            self.table.names[assetid] = value
+        else:
+            self.table.filelocs[assetid] = value
+            self.forgetthumbnail(assetid)
+        rows = [row] if row is not None else self.rowsof([assetid])
+        for row in rows:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [role])
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.ItemIsDropEnabled  # drops between items
+        return super().flags(index) | Qt.ItemFlag.ItemIsEditable | Qt.ItemFlag.ItemIsDragEnabled | Qt.ItemFlag.ItemIsDropEnabled
+
+    def supportedDropActions(self):
+        return Qt.DropAction.MoveAction
+
+    def mimeTypes(self):
+        return [ASSETIDSMIMETYPE]
+
+    def mimeData(self, indexes):
+        mime = QMimeData()
+        ids = array('i', sorted(self.rows[index.row()] for index in indexes if index.isValid()))
+        mime.setData(ASSETIDSMIMETYPE, QByteArray(ids.tobytes()))
+        return mime
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if not data.hasFormat(ASSETIDSMIMETYPE):
+            return False
+        ids = array('i')
+        ids.frombytes(bytes(data.data(ASSETIDSMIMETYPE)))
+        if row < 0 and parent.isValid():
+            target = self.rows[parent.row()]
+            if self.tree.isfolder(target) and target not in ids:
+                self.reparentrequested.emit(list(ids), target)  # dropped onto a folder goes inside it
+                return True
+        if row < 0:
+            row = parent.row() if parent.isValid() else len(self.rows)  # dropped onto an item goes in front of it
+        if row < len(self.rows):
+            position = self.positionsof([self.rows[row]])[self.rows[row]] if self.isfiltered() else row
+        else:
+            position = len(self.listing)
+        self.moverequested.emit(list(ids), position)
+        # the move already happened, so the view has nothing left to remove afterwards
+        return True
+
+    def thumbnail(self, assetid, assettype):
+        if assetid in self.thumbnails:
+            self.thumbnails.move_to_end(assetid)
+            return self.thumbnails[assetid]
+        source = self.table.filelocs[assetid]
+        if not source and assettype != "Material":  # a material without a file still gets the default swatch
+            return None
+        self.thumbnailer.request(assetid, assettype, source)
+        return None
+
+    def thumbnailsready(self, ready):
+        for assetid, image in ready.items():
+            self.thumbnails[assetid] = QIcon(QPixmap.fromImage(image)) if image is not None else None
+        while len(self.thumbnails) > THUMBMEMORYLIMIT:
+            self.thumbnails.popitem(last=False)
+        if self.rows:
+            # the view only repaints rows it is showing
+            self.dataChanged.emit(self.index(0), self.index(len(self.rows) - 1), [Qt.ItemDataRole.DecorationRole])
+
+    def forgetthumbnail(self, assetid):
+        self.thumbnails.pop(assetid, None)
+        self.thumbnailer.discard(assetid)
+
+    def assetid(self, row):
+        return self.rows[row]
+
+    def isfiltered(self):
+        return self.rows is not self.listing
+
+    def matches(self, assetid):
+        text, typecode = self.filter
+        self.searchindex.catchup()
+        return (not text or text in self.searchindex.lowernames[assetid]) and \
+            (typecode is None or self.table.types[assetid] == typecode)
+
+    def positionsof(self, assetids):
+        # listing position of each id, one pass however many ids are asked for
+        wanted = set(assetids)
+        return {assetid: position for position, assetid in enumerate(self.listing) if assetid in wanted}
+
+    def rowsof(self, assetids):
+        wanted = set(assetids)
+        return [row for row, assetid in enumerate(self.rows) if assetid in wanted]
+
+    def insertassets(self, position, assetids):
+        # position is in the unfiltered listing, the view only hears about matching rows
+        if not assetids:
+            return
+        self.tree.adopt(assetids, self.folder)
+        self.indexlater(assetids)
+        if not self.isfiltered():
+            self.beginInsertRows(QModelIndex(), position, position + len(assetids) - 1)
+            self.listing[position:position] = assetids
+            self.endInsertRows()
+            return
+
+        self.listing[position:position] = assetids
+        visible = [assetid for assetid in assetids if self.matches(assetid)]
+        if visible:
+            before = set(self.listing[:position])
+            row = sum(1 for assetid in self.rows if assetid in before)
+            self.beginInsertRows(QModelIndex(), row, row + len(visible) - 1)
+            self.rows[row:row] = visible
+            self.endInsertRows()
+
+    def removeids(self, assetids):
+        # ids may sit in any folder, those outside the shown one are simply unlinked
+        gone = set(assetids)
+        elsewhere = {assetid for assetid in gone if self.table.parents[assetid] != self.folder}
+        if elsewhere:
+            self.tree.detach(elsewhere)
+            gone -= elsewhere
+        if not gone:
+            return
+        self.searchindex.discard(gone)
+        runs = list(rowruns(self.rowsof(gone)))
+        if len(runs) > BULKRESETRUNS:
+            # scattered rows: one linear rebuild under a reset beats a signal per run
+            self.relist([assetid for assetid in self.listing if assetid not in gone])
+            return
+        for start, count in reversed(runs):
+            self.beginRemoveRows(QModelIndex(), start, start + count - 1)
+            del self.rows[start:start + count]
+            self.endRemoveRows()
+        if self.isfiltered():
+            self.listing[:] = [assetid for assetid in self.listing if assetid not in gone]
+
+    def insertatpositions(self, entries):
+        # entries: (position, asset id) sorted by position, each position being where the
+        # id ends up in the listing, as recorded when it was taken out
+        if not entries:
+            return
+        if len(entries) <= BULKRESETRUNS:
+            for position, assetid in entries:
+                self.insertassets(position, [assetid])
+            return
+        ids = [assetid for _, assetid in entries]
+        self.tree.adopt(ids, self.folder)
+        self.indexlater(ids)
+        self.relist(mergepositions(self.listing, entries))
+
+    def moveids(self, assetids, position):
+        # moves the ids, in listing order, in front of whatever sits at position; returns their new start
+        moving = set(assetids)
+        ordered = [assetid for assetid in self.listing if assetid in moving]
+        rest = [assetid for assetid in self.listing if assetid not in moving]
+        target = position - sum(1 for assetid in self.listing[:position] if assetid in moving)
+        self.relist(rest[:target] + ordered + rest[target:])
+        return target
+
+    def relist(self, listing):
+        # swap in a new listing order in one reset, keeping whatever the filter shows
+        self.beginResetModel()
+        if self.isfiltered():
+            self.rows = [assetid for assetid in listing if self.matches(assetid)]
+            self.listing[:] = listing
+        else:
+            self.listing[:] = listing
+        self.endResetModel()
+
+    def setfilter(self, text, assettype=None):
+        text = text.lower()
+        typecode = ASSETTYPES.index(assettype) if assettype else None
+        if (text, typecode) == self.filter:
+            return
+        oldtext, oldtypecode = self.filter
+        narrowing = self.isfiltered() and typecode == oldtypecode and oldtext in text
+        self.searchindex.catchup()
+
+        self.beginResetModel()
+        self.filter = (text, typecode)
+        if narrowing and text:
+            # typing more only ever removes rows, so only look at what is already shown
+            lowernames = self.searchindex.lowernames
+            self.rows = [assetid for assetid in self.rows if text in lowernames[assetid]]
+        else:
+            self.rows = self.filtered()
+        self.endResetModel()
+
+    def filtered(self):
+        text, typecode = self.filter
+        if not text and typecode is None:
+            return self.listing
+        if len(text) < 3 and typecode is None:
+            # too short for trigrams and likely to match most names, one pass in listing order
+            self.searchindex.catchup()
+            lowernames = self.searchindex.lowernames
+            return [assetid for assetid in self.listing if text in lowernames[assetid]]
+        results = self.searchindex.search(text, typecode)
+        return [assetid for assetid in self.listing if assetid in results]
+
+    def resettree(self, children):
+        # swaps in a whole new set of loaded folders, as when a project is opened
+        self.beginResetModel()
+        self.tree.children = children
+        self.tree.folders = {}
+        for folderid, assetids in children.items():
+            self.tree.adopt(assetids, folderid)
+        self.folder = ROOTFOLDER
+        self.listing = children[ROOTFOLDER]
+        self.searchindex.clear()
+        self.indexlater(self.listing)
+        self.thumbnails.clear()
+        self.rows = self.filtered()
+        self.endResetModel()
+
+    def setfolder(self, folderid):
+        # shows another folder, which must be loaded; the search index only ever covers this one
+        self.beginResetModel()
+        self.folder = folderid
+        self.listing = self.tree.children[folderid]
+        self.searchindex.clear()
+        self.indexlater(self.listing)
+        self.rows = self.filtered()
+        self.endResetModel()
+
+    def indexlater(self, assetids):
+        # queued for the search index, built in idle slices so the first keystroke finds it ready
+        self.searchindex.extend(assetids)
+        if assetids and not self.indextimer.isActive():
+            self.indextimer.start(0)
+
+    def indexchunk(self):
+        self.searchindex.catchup(time.perf_counter() + INDEXIDLEMS / 1000)
+        if not self.searchindex.pending:
+            self.indextimer.stop()
+
+class RefreshScheduler:
+    # Panels mark themselves dirty, each dirty panel refreshes once on the next frame or idle tick
+    def __init__(self, framems=REFRESHFRAMEMS):
+        self.framems = framems
+        self.refreshers = {}  # name -> callback, run in registration order
+        self.dirty = set()
+        self.suspended = 0
+        self.lastflush = 0.0
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def register(self, name, callback):
+        self.refreshers[name] = callback
+
+    def markdirty(self, *names):
+        self.dirty.update(names or self.refreshers)
+        self.schedule()
+
+    def schedule(self):
+        if self.suspended or not self.dirty or self.timer.isActive():
+            return
+        wait = self.framems - (time.perf_counter() - self.lastflush) * 1000
+        self.timer.start(max(0, math.ceil(wait)))
+
+    @profiled("RefreshScheduler.flush")
+    def flush(self):
+        self.timer.stop()
+        if self.suspended:
+            return
+        dirty, self.dirty = self.dirty, set()
+        self.lastflush = time.perf_counter()
+        for name, callback in self.refreshers.items():
+            if name in dirty:
+                callback()
+
+    @contextmanager
+    def suspend(self):
+        # nothing refreshes while suspended, whatever got marked runs once afterwards
+        self.suspended += 1
+        try:
+            yield
+        finally:
+            self.suspended -= 1
+            self.schedule()
 
 class GameEditor(QMainWindow):
     def __init__(self):
@@ -67,8 +3972,6 @@ class GameEditor(QMainWindow):
         version = 0
         self.setWindowTitle(f"Engine - v{version}")
 
-        self.undo_stack = []
-        self.redo_stack = []
         self.undo_timer = QTimer()
         self.undo_timer.timeout.connect(self.undo)
         self.redo_timer = QTimer()
@@ -85,6 +3988,73 @@ class GameEditor(QMainWindow):
         editmenu.addSeparator()
 
         filemenu = menu.addMenu("&File")
+        openprojectaction = QAction("&Open Project...", self)
+        openprojectaction.setShortcut("Ctrl+O")
+        openprojectaction.triggered.connect(self.chooseproject)
+        filemenu.addAction(openprojectaction)
+        saveprojectaction = QAction("&Save Project", self)
+        saveprojectaction.setShortcut("Ctrl+S")
+        saveprojectaction.triggered.connect(self.saveproject)
+        filemenu.addAction(saveprojectaction)
+        saveprojectasaction = QAction("Save Project &As...", self)
+        saveprojectasaction.setShortcut("Ctrl+Shift+S")
+        saveprojectasaction.triggered.connect(self.saveprojectas)
+        filemenu.addAction(saveprojectasaction)
+        filemenu.addSeparator()
+        self.project = None  # mapped ProjectFile, folders not opened yet are decoded from it on demand
+        self.projectpath = None
+        self.journal = None  # ProjectJournal autosaving edits once the project has a file
+
+        openfolderaction = QAction("Open Project &Folder...", self)
+        openfolderaction.triggered.connect(self.chooseprojectfolder)
+        filemenu.addAction(openfolderaction)
+
+        self.pasting = None  # (records, next offset, pasted ids) while a big paste is in flight
+        self.pastetimer = QTimer()
+        self.pastetimer.timeout.connect(self.pastechunk)
+
+        self.scanner = None
+        self.scanfolder = ROOTFOLDER
+        self.scannedids = {}  # scanned path -> asset id
+        self.scantimer = QTimer()
+        self.scantimer.setInterval(SCANPOLLMS)
+        self.scantimer.timeout.connect(self.applyscanevents)
+
+        self.playaction = QAction("&Play", self)
+        self.playaction.setShortcut("F5")
+        self.playaction.triggered.connect(self.toggleplay)
+        playmenu = menu.addMenu("&Viewport")
+        playmenu.addAction(self.playaction)
+        playmenu.addSeparator()
+        overlayaction = QAction("Performance &Overlay", self)
+        overlayaction.setShortcut("F3")
+        overlayaction.setCheckable(True)
+        overlayaction.toggled.connect(lambda checked: self.viewport.setoverlay(checked))
+        playmenu.addAction(overlayaction)
+        self.traceaction = QAction("&Record Trace", self)
+        self.traceaction.setCheckable(True)
+        self.traceaction.toggled.connect(self.toggletrace)
+        playmenu.addAction(self.traceaction)
+        exporttraceaction = QAction("&Export Trace...", self)
+        exporttraceaction.triggered.connect(self.exporttrace)
+        playmenu.addAction(exporttraceaction)
+
+        scriptsmenu = menu.addMenu("S&cripts")
+        runscriptsaction = QAction("&Run Selected Scripts", self)
+        runscriptsaction.setShortcut("Ctrl+R")
+        runscriptsaction.triggered.connect(lambda: self.runscripts([self.assetmodel.assetid(row) for row in self.selectedrows()]))
+        scriptsmenu.addAction(runscriptsaction)
+        reloadscriptsaction = QAction("Re&load Changed Scripts", self)
+        reloadscriptsaction.setShortcut("Ctrl+Shift+R")
+        reloadscriptsaction.triggered.connect(self.reloadscripts)
+        scriptsmenu.addAction(reloadscriptsaction)
+        stopscriptsaction = QAction("&Stop Running Scripts", self)
+        stopscriptsaction.triggered.connect(self.stopscripts)
+        scriptsmenu.addAction(stopscriptsaction)
+        self.scripts = ScriptRuntime(scriptcachepath, self.scriptfinished)
+        self.materials = MaterialLibrary()
+        self.imageviews = []  # open image windows, kept referenced while shown
+        self.console = None  # script output, added to the left panel by the first message
 
         # Left panel
         self.left = QWidget()
@@ -101,14 +4071,14 @@ class GameEditor(QMainWindow):
         self.left.setMinimumWidth(200)
         self.right.setMinimumWidth(200)
 
-        viewport = Viewport()
-        viewport.setStyleSheet("border: 1px solid black;")
+        self.viewport = Viewport()
+        self.viewport.setStyleSheet("border: 1px solid black;")
 
-        # Property fields
-        self.prop_name = QLineEdit()
-        self.prop_type = QLineEdit()        
-        self.prop_type.setReadOnly(True)
-        self.prop_fileloc = QLineEdit()
+        # Property rows are built by the first single selection, see buildinspector
+        self.prop_name = None
+        self.itemmenu = None  # asset context menus, built on first use
+        self.menuindex = QModelIndex()
+        self.settingswindow = None
 
         self.multipleselectedlabel = QLabel("Multiple Selected, Select one to choose individual Properties.")
         self.multipleselectedlabel.setStyleSheet("color: grey; border: none;")
@@ -122,56 +4092,76 @@ class GameEditor(QMainWindow):
         self.rightlayout.addWidget(self.nothingselectedlabel)
         self.nothingselectedlabel.hide()
 
-        self.namelabel = QLabel("Name:")
-        self.namelabel.setStyleSheet("border: none;")
-        self.type_label = QLabel("Type:")
-        self.type_label.setStyleSheet("border: none;")
-
-        self.rightlayout.addRow(self.namelabel, self.prop_name)
-        self.rightlayout.addRow(self.type_label, self.prop_type)
-
-        self.fileloc_row_index = self.rightlayout.rowCount()
-        self.rightlayout.addRow("File Location:", self.prop_fileloc)
-        self.prop_fileloc.hide()
-        self.prop_fileloc.editingFinished.connect(self.updatefilelocation)
-
-        self.prop_name.editingFinished.connect(self.renamecurrentitem)
-
         hsplit = CustomSplitter(Qt.Orientation.Horizontal, reset_sizes=[150, 500, 200])
         hsplit.addWidget(self.left)
-        hsplit.addWidget(viewport)
+        hsplit.addWidget(self.viewport)
         hsplit.addWidget(self.right)
         hsplit.setSizes(hsplit.reset_sizes_list)
 
-        self.bottom = QListWidget()
+        self.assets = AssetTable()
+        self.history = UndoHistory(self.assets)
+        self.assetmodel = AssetModel(self.assets, self)
+        self.assetmodel.edited.connect(self.recordedit)
+        self.bottom = QListView()
+        self.bottom.setModel(self.assetmodel)
         self.bottom.setStyleSheet("border: 1px solid black;")
         self.bottom.setMinimumHeight(120)
         self.bottom.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.bottom.customContextMenuRequested.connect(self.showassetscontextmenu)
 
-        self.bottom.setViewMode(QListWidget.ViewMode.IconMode)
+        self.bottom.setViewMode(QListView.ViewMode.IconMode)
         self.bottom.setIconSize(QSize(ICONSIZE, ICONSIZE))
         self.bottom.setGridSize(QSize(100, 100))
-        self.bottom.setMovement(QListWidget.Movement.Static)
+        self.bottom.setMovement(QListView.Movement.Static)
         self.bottom.setSpacing(10)
+        self.bottom.setUniformItemSizes(True)  # lets the view lay out 100k+ rows without measuring each
+        self.bottom.setLayoutMode(QListView.LayoutMode.Batched)
 
-        self.bottom.setSelectionMode(QListWidget.SelectionMode.ExtendedSelection)
-        self.bottom.setEditTriggers(QListWidget.EditTrigger.NoEditTriggers)
+        self.bottom.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+        self.bottom.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.bottom.setDragDropMode(QListView.DragDropMode.DragDrop)
+        self.bottom.viewport().setAcceptDrops(True)  # static movement turns viewport drops off, the model handles moves
+        self.bottom.setDefaultDropAction(Qt.DropAction.MoveAction)
+        self.bottom.setDropIndicatorShown(True)
+        self.assetmodel.moverequested.connect(self.moveassets)
+        self.assetmodel.reparentrequested.connect(self.reparentassets)
+        self.bottom.doubleClicked.connect(self.openitem)
 
         self.statuslabel = QLabel(self)
         self.statuslabel.setStyleSheet("color: gray; font-size: 12px;")
         self.statuslabel.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
         self.statuslabel.setFixedHeight(20)  # small text
 
-        self.updatestatuslabel()
-
-        self.bottom.itemSelectionChanged.connect(self.updatestatuslabel)
+        self.refresh = RefreshScheduler()
+        self.refresh.register("status", self.updatestatuslabel)
+        self.refresh.register("properties", self.updatepropertiespanel)
 
         bottomcontainer = QWidget()
         bottomlayout = QVBoxLayout()
         bottomlayout.setContentsMargins(0,0,0,0)
         bottomlayout.setSpacing(0)
 
+        self.assetsearch = QLineEdit()
+        self.assetsearch.setPlaceholderText("Search assets...")
+        self.assetsearch.setClearButtonEnabled(True)
+        self.assetsearch.textChanged.connect(self.applyassetfilter)
+        self.assetfiltertype = QComboBox()
+        self.assetfiltertype.addItem("All Types", None)
+        for assettype in ASSETTYPES:
+            self.assetfiltertype.addItem(assettype, assettype)
+        self.assetfiltertype.currentIndexChanged.connect(self.applyassetfilter)
+
+        self.folderpath = QLineEdit("/")
+        self.folderpath.setToolTip("Folder shown below, type a path and press Enter to go there")
+        self.folderpath.returnPressed.connect(self.openpath)
+
+        filterlayout = QHBoxLayout()
+        filterlayout.setContentsMargins(0,0,0,0)
+        filterlayout.addWidget(self.folderpath)
+        filterlayout.addWidget(self.assetsearch)
+        filterlayout.addWidget(self.assetfiltertype)
+
+        bottomlayout.addLayout(filterlayout)  # search/filter bar
         bottomlayout.addWidget(self.bottom)  # assets panel
         bottomlayout.addWidget(self.statuslabel)  # status text
 
@@ -186,61 +4176,481 @@ class GameEditor(QMainWindow):
 
         self.bottom.installEventFilter(self)
 
-        self.bottom.itemSelectionChanged.connect(self.updatestatuslabel)
-        self.bottom.itemSelectionChanged.connect(self.updatepropertiespanel)
-        self.bottom.itemChanged.connect(self.updatepropertiespanel)
+        self.bottom.selectionModel().selectionChanged.connect(self.selectionchanged)
+        self.assetmodel.dataChanged.connect(self.assetdatachanged)
+        self.assetmodel.rowsInserted.connect(self.assetcountchanged)
+        self.assetmodel.rowsRemoved.connect(self.assetcountchanged)
+        self.assetmodel.modelReset.connect(self.assetcountchanged)
+
+        self.framestatstimer = QTimer()
+        self.framestatstimer.timeout.connect(self.updateframestats)
 
         self.createasset("Folder", "Assets")
-        self.undo_stack = []
+        self.history.clear()
+
+        self.refresh.flush()
+
+    def closeEvent(self, event):
+        self.assetmodel.thumbnailer.shutdown()
+        self.scripts.shutdown()
+        if self.prop_name is not None:
+            self.prop_waveform.setsource(None)
+        if self.journal is not None:
+            self.journal.close()
+        if self.project is not None:
+            self.project.close()
+        if self.scanner is not None:
+            self.scanner.stop()
+        super().closeEvent(event)
+
+    def chooseproject(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Project", "", f"Projects (*{PROJECTEXTENSION})")
+        if path:
+            self.openproject(path)
+
+    def openproject(self, path):
+        try:
+            project = ProjectFile(path)
+        except (OSError, ValueError) as error:
+            self.statusBar().showMessage(f"Could not open {path}: {error}", 5000)
+            return
+        generation = project.generation
+        # edits journaled after the snapshot was written, e.g. before a crash, are replayed on top.
+        # That needs every folder; otherwise only the top level is decoded and the rest waits
+        # until it is opened.
+        journalgeneration, changes, _ = readjournal(path + JOURNALEXTENSION)
+        if journalgeneration != generation:
+            changes = []
+        if changes:
+            with PROFILER.scope("journal replay"):
+                records, children = loadrecords(project.records())
+                for change in changes:
+                    applychange(change, records, children)
+            decoded = reachable(records, children)
+            folders = [ROOTFOLDER] + [record[0] for record in decoded if record[2] == FOLDERTYPECODE]
+            children = {folderid: children.get(folderid, []) for folderid in folders}
+        else:
+            decoded = [(assetid, ROOTFOLDER, *record) for assetid, *record in project.children(ROOTFOLDER)]
+            children = {ROOTFOLDER: [record[0] for record in decoded]}
+
+        self.closejournal()
+        if self.project is not None:
+            self.project.close()
+        self.project = project
+        if self.scanner is not None:
+            self.scanner.stop()
+            self.scanner = None
+            self.scannedids = {}
+        with self.bulkedit():
+            self.finishpaste()
+            self.history.clear()
+            self.assets.clear()
+            self.assets.reserve(project.idlimit)  # ids of folders not loaded yet stay taken
+            self.assets.place(decoded)
+            self.assetmodel.resettree(children)
+            self.bottom.clearSelection()
+        self.updatefolderpath()
+        self.projectpath = path
+        self.journal = ProjectJournal(path, generation, project)
+        if changes:
+            self.journal.compact()
+            self.statusBar().showMessage(f"Recovered {len(changes)} unsaved change(s)", 5000)
+        self.setWindowTitle(f"Engine - {os.path.basename(path)}")
+
+    def closejournal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def journalchange(self, *change):
+        if self.journal is not None:
+            self.journal.append(change)
+
+    def journalinsert(self, parent, entries):
+        # entries: (position in the folder, asset id) sorted by position
+        if self.journal is not None:
+            assets = self.assets
+            entries = [(position, assetid, *assets.record(assetid)) for position, assetid in entries]
+            if entries:
+                self.journal.append(("insert", parent, entries))
+
+    def loadfolder(self, folderid):
+        # decodes a folder's contents from the project file the first time it is needed
+        tree = self.assetmodel.tree
+        if tree.isloaded(folderid):
+            return
+        records = []
+        if self.project is not None:
+            records = [(assetid, folderid, *record) for assetid, *record in self.project.children(folderid)]
+        self.assets.place(records)
+        ids = [record[0] for record in records]
+        tree.children[folderid] = ids
+        tree.adopt(ids, folderid)
+
+    def loadsubtree(self, folderids):
+        tree = self.assetmodel.tree
+        stack = list(folderids)
+        while stack:
+            folderid = stack.pop()
+            self.loadfolder(folderid)
+            stack.extend(assetid for assetid in tree.children[folderid] if tree.isfolder(assetid))
+
+    def openfolder(self, folderid):
+        if folderid == self.assetmodel.folder:
+            return
+        self.finishpaste()
+        self.loadfolder(folderid)
+        with self.bulkedit():
+            self.bottom.clearSelection()
+            self.assetmodel.setfolder(folderid)
+        self.updatefolderpath()
+
+    def openpath(self):
+        folderid = self.assetmodel.tree.find(self.folderpath.text(), self.loadfolder)
+        if folderid is None:
+            self.statusBar().showMessage(f"No folder {self.folderpath.text()}", 3000)
+            self.updatefolderpath()
+            return
+        self.openfolder(folderid)
+
+    def openparentfolder(self):
+        folderid = self.assetmodel.folder
+        if folderid != ROOTFOLDER:
+            self.openfolder(self.assets.parents[folderid])
+
+    def openitem(self, index):
+        assetid = self.assetmodel.assetid(index.row())
+        if self.assetmodel.tree.isfolder(assetid):
+            self.openfolder(assetid)
+        elif self.assets.typeof(assetid) == "Image" and self.assets.filelocs[assetid]:
+            self.openimage(self.assets.filelocs[assetid])
+
+    def openimage(self, path):
+        if not os.path.isfile(path):
+            self.statusBar().showMessage(f"{path} does not exist", 3000)
+            return
+        self.imageviews = [view for view in self.imageviews if view.isVisible()]
+        view = ImageView(path)
+        self.imageviews.append(view)
+        view.show()
+
+    def updatefolderpath(self):
+        self.folderpath.setText("/" + self.assetmodel.tree.path(self.assetmodel.folder))
+
+    def saveprojectas(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Project", self.projectpath or "", f"Projects (*{PROJECTEXTENSION})")
+        if not path:
+            return
+        if not path.endswith(PROJECTEXTENSION):
+            path += PROJECTEXTENSION
+        self.projectpath = path
+        self.saveproject()
+
+    def saveproject(self):
+        if self.projectpath is None:
+            self.saveprojectas()
+            return
+        journal = self.journal
+        if journal is not None and journal.projectpath == self.projectpath:
+            # everything is journaled already, the writer folds it into the snapshot in the background
+            if journal.error is not None:
+                self.statusBar().showMessage(f"Autosave failed: {journal.error}", 5000)
+                journal.error = None
+            journal.compact()
+            self.statusBar().showMessage(f"Saved {self.projectpath}", 3000)
+            return
+
+        # a full write needs every folder, so whatever is still only in the old file is loaded first
+        self.loadsubtree([ROOTFOLDER])
+        assets = self.assets
+        records = [(assetid, assets.parents[assetid], *assets.record(assetid))
+                   for assetid, _ in self.assetmodel.tree.descendants([ROOTFOLDER])]
+        self.closejournal()
+        if self.project is not None:
+            # nothing is read from it anymore, and Windows will not replace a file that is mapped
+            self.project.close()
+            self.project = None
+        try:
+            ProjectFile.save(self.projectpath, records)
+            project = ProjectFile(self.projectpath)
+            self.journal = ProjectJournal(self.projectpath, 0, project)
+        except (OSError, ValueError) as error:
+            self.statusBar().showMessage(f"Could not save {self.projectpath}: {error}", 5000)
+            return
+        self.project = project
+        self.setWindowTitle(f"Engine - {os.path.basename(self.projectpath)}")
+        self.statusBar().showMessage(f"Saved {len(records)} asset(s) to {self.projectpath}", 3000)
+
+    def chooseprojectfolder(self):
+        path = QFileDialog.getExistingDirectory(self, "Open Project Folder")
+        if path:
+            self.openprojectfolder(path)
 
-        self.updatepropertiespanel()
+    def openprojectfolder(self, path):
+        if self.scanner is not None:
+            self.scanner.stop()
+            self.removeassets([assetid for assetid in map(self.scannedid, list(self.scannedids)) if assetid is not None])
+            self.scannedids = {}
+        self.scanfolder = self.assetmodel.folder  # the scanned tree goes into the folder being shown
+        self.scanner = ProjectScanner(path)
+        self.scanner.start()
+        self.scantimer.start()
+        self.statusBar().showMessage(f"Scanning {self.scanner.root}...")
+
+    def applyscanevents(self):
+        # Apply what the scanner found in small time slices so the UI keeps painting
+        scanner = self.scanner
+        if scanner is None:
+            self.scantimer.stop()
+            return
+        deadline = time.perf_counter() + SCANAPPLYMS / 1000
+        while time.perf_counter() < deadline:
+            try:
+                kind, payload = scanner.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "add":
+                tree = self.assetmodel.tree
+                byparent = {}
+                for path, assettype in payload:
+                    if self.scannedid(path) is None:
+                        # directories arrive before what is in them, so the parent is usually known
+                        parent = self.scannedid(os.path.dirname(path))
+                        if parent is None or not tree.isloaded(parent):
+                            parent = self.scanfolder if tree.isloaded(self.scanfolder) else ROOTFOLDER
+                        assetid = self.assets.add(assettype, os.path.basename(path), path, parent)
+                        if assettype == "Folder":
+                            tree.children[assetid] = []
+                        self.scannedids[path] = assetid
+                        byparent.setdefault(parent, []).append(assetid)
+                for parent, ids in byparent.items():
+                    self.insertinto(parent, ids)
+            elif kind == "remove":
+                removed = [self.scannedid(path) for path in payload]
+                for path in payload:
+                    self.scannedids.pop(path, None)
+                self.removeassets([assetid for assetid in removed if assetid is not None])
+            elif kind == "modify":
+                scripts = []
+                for path in payload:
+                    assetid = self.scannedid(path)
+                    if assetid is not None:
+                        self.assetmodel.forgetthumbnail(assetid)
+                        if self.assets.typeof(assetid) == "Script":
+                            scripts.append((assetid, path))
+                        elif self.assets.typeof(assetid) == "Material" and self.materials.reload(path):
+                            self.viewport.refreshcaches()
+                        elif self.assets.typeof(assetid) == "Image" and path in self.viewport.atlas:
+                            self.viewport.refreshsprite(path)
+                        elif self.prop_name is not None and path == self.prop_waveform.source:
+                            self.prop_waveform.setsource(path, reload=True)
+                if scripts:
+                    self.scripts.reload(scripts)
+                if self.assetmodel.rows:
+                    self.assetmodel.dataChanged.emit(self.assetmodel.index(0), self.assetmodel.index(self.assetmodel.rowCount() - 1),
+                                                     [Qt.ItemDataRole.DecorationRole])
+            elif kind == "scanned":
+                self.statusBar().showMessage(f"Scanned {len(self.scannedids)} file(s), watching for changes ({payload})", 5000)
+
+    def scannedid(self, path):
+        # the asset scanned from path, unless it has since been removed or pointed elsewhere,
+        # in which case its id may already belong to something else
+        assetid = self.scannedids.get(path)
+        if assetid is None or not self.assets.isalive(assetid) or self.assets.filelocs[assetid] != path:
+            return None
+        return assetid
+
+    def assetmaterial(self, assetid):
+        # the shared Material a Material asset draws with, the default one without a readable file
+        path = self.assets.filelocs[assetid]
+        if path:
+            try:
+                return self.materials.get(path)
+            except (OSError, ValueError):
+                pass
+        return self.materials.default
+
+    def placesprites(self, assetids):
+        # drops Image assets into the viewport as atlas sprites, fanned out from the middle
+        viewport = self.viewport
+        x, y = viewport.width() / 2, viewport.height() / 2
+        placed = 0
+        for assetid in assetids:
+            path = self.assets.filelocs[assetid]
+            if self.assets.typeof(assetid) != "Image" or not path:
+                continue
+            try:
+                viewport.addsprite(x + placed * 16, y + placed * 16, path)
+            except (OSError, ValueError) as error:
+                self.statusBar().showMessage(f"Could not place {self.assets.names[assetid]}: {error}", 5000)
+                continue
+            placed += 1
+        if placed:
+            self.statusBar().showMessage(f"Placed {placed} sprite(s), {len(viewport.atlas.pages)} atlas page(s)", 3000)
+
+    def runscripts(self, assetids):
+        for assetid in assetids:
+            if self.assets.typeof(assetid) != "Script":
+                continue
+            name, path = self.assets.names[assetid], self.assets.filelocs[assetid]
+            if not path or not os.path.isfile(path):
+                self.appendconsole(f"{name}: no source file, set its File Location")
+                continue
+            try:
+                self.scripts.run(assetid, path)
+            except OSError as error:
+                self.appendconsole(f"{name}: {error}")
+
+    def reloadscripts(self):
+        table = self.assets
+        scripts = [(assetid, fileloc) for assetid, (typecode, fileloc) in enumerate(zip(table.types, table.filelocs))
+                   if typecode == SCRIPTTYPECODE and fileloc and table.isalive(assetid)]
+        changed = self.scripts.reload(scripts)
+        self.statusBar().showMessage(f"Recompiling {changed} changed script(s)" if changed else "Scripts are up to date", 3000)
+
+    def stopscripts(self):
+        stopped = self.scripts.stop()
+        self.statusBar().showMessage(f"Stopped {stopped} script(s)", 3000)
+
+    def scriptfinished(self, kind, assetid, path, ok, output, error, seconds, cached):
+        name = self.assets.names[assetid] if self.assets.isalive(assetid) else os.path.basename(path)
+        if output:
+            self.appendconsole(output.rstrip("\n"))
+        if error:
+            self.appendconsole(f"{name}: {error.rstrip()}")
+        elif kind == "run":
+            self.statusBar().showMessage(f"{name} finished in {seconds * 1000:.0f} ms{' (cached code)' if cached else ''}", 3000)
+
+    def appendconsole(self, text):
+        if self.console is None:
+            self.console = QPlainTextEdit()
+            self.console.setReadOnly(True)
+            self.console.setMaximumBlockCount(CONSOLELINES)
+            self.console.setPlaceholderText("Script output")
+            self.leftlayout.addRow(self.console)
+        self.console.appendPlainText(text)
+
+    def toggleplay(self):
+        if self.viewport.isplaying():
+            self.viewport.stop()
+            self.framestatstimer.stop()
+            self.playaction.setText("&Play")
+            self.statusBar().clearMessage()
+        else:
+            self.viewport.play()
+            self.framestatstimer.start(500)
+            self.playaction.setText("&Stop")
+
+    def toggletrace(self, checked):
+        if checked:
+            PROFILER.start()
+            self.statusBar().showMessage("Recording trace...", 3000)
+        else:
+            PROFILER.stop()
+            self.statusBar().showMessage(f"Trace stopped, {len(PROFILER.events)} event(s) recorded", 3000)
+
+    def exporttrace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "trace.json", "Chrome Trace (*.json)")
+        if not path:
+            return
+        try:
+            PROFILER.export(path)
+        except OSError as error:
+            self.statusBar().showMessage(f"Could not export trace: {error}", 5000)
+            return
+        self.statusBar().showMessage(f"Exported {len(PROFILER.events)} event(s) to {path}", 3000)
+
+    def updateframestats(self):
+        stats = self.viewport.loop.stats.summary()
+        self.statusBar().showMessage(
+            f"{stats['fps']:.0f} fps | update {stats['updatems']:.2f} ms | "
+            f"render {stats['renderms']:.2f} ms | dropped steps {stats['droppedsteps']}"
+        )
+
+    def selectedrows(self):
+        rows = []
+        for selrange in self.bottom.selectionModel().selection():
+            rows.extend(range(selrange.top(), selrange.bottom() + 1))
+        rows.sort()
+        return rows
+
+    def selectedcount(self):
+        return sum(selrange.height() for selrange in self.bottom.selectionModel().selection())
+
+    def selectrows(self, start, end):
+        selection = QItemSelection(self.assetmodel.index(start), self.assetmodel.index(end))
+        self.bottom.selectionModel().select(selection, QItemSelectionModel.SelectionFlag.Select)
+
+    def selectids(self, assetids, atend=False):
+        model = self.assetmodel
+        if atend and not model.isfiltered():
+            # fresh ids sit at the end of the listing
+            end = model.rowCount() - 1
+            self.selectrows(end - len(assetids) + 1, end)
+            return
+        selection = QItemSelection()
+        for start, count in rowruns(model.rowsof(assetids)):
+            selection.select(model.index(start), model.index(start + count - 1))
+        self.bottom.selectionModel().select(selection, QItemSelectionModel.SelectionFlag.Select)
+
+    def applyassetfilter(self):
+        assettype = self.assetfiltertype.currentData()
+        self.assetmodel.setfilter(self.assetsearch.text(), assettype)
+
+    def selectionchanged(self, selected, deselected):
+        self.refresh.markdirty("status", "properties")
+
+    def assetcountchanged(self, *args):
+        self.refresh.markdirty("status")
+
+    def assetdatachanged(self, topleft, bottomright, roles=()):
+        if list(roles) == [Qt.ItemDataRole.DecorationRole]:
+            return  # thumbnails arriving don't touch the properties panel
+        self.refresh.markdirty("properties")
 
     def updatestatuslabel(self):
-        selectedcount = len(self.bottom.selectedItems())
-        totalcount = self.bottom.count()
+        selectedcount = self.selectedcount()
+        totalcount = self.assetmodel.rowCount()
         
         if selectedcount > 0:
             self.statuslabel.setText(f"{selectedcount} item(s) selected")
+        elif self.assetmodel.isfiltered():
+            self.statuslabel.setText(f"{totalcount} of {len(self.assetmodel.listing)} item(s) match")
         else:
             self.statuslabel.setText(f"{totalcount} item(s) in current folder")
 
+    @profiled("GameEditor.eventFilter")
     def eventFilter(self, source, event):
         if source is self.bottom:
             if event.type() == event.Type.KeyPress:
                 if event.key() == Qt.Key.Key_F2:
-                    item = self.bottom.currentItem()
-                    if item:
-                        self.bottom.editItem(item)
+                    index = self.bottom.currentIndex()
+                    if index.isValid():
+                        self.bottom.edit(index)
                     return True
 
                 if event.key() == Qt.Key.Key_C and (event.modifiers() & Qt.KeyboardModifier.ControlModifier): # Copy
-                    selected_items = self.bottom.selectedItems()
-                    if selected_items:
-                        self.copied_items = [(i.text(), i.icon(), i.data(Qt.ItemDataRole.UserRole)) for i in selected_items]
+                    selected_rows = self.selectedrows()
+                    if selected_rows:
+                        self.copyassets([self.assetmodel.assetid(row) for row in selected_rows])
                     return True
                 
                 if event.key() == Qt.Key.Key_V and (event.modifiers() & Qt.KeyboardModifier.ControlModifier):  # Paste
-                    if hasattr(self, "copied_items"):
-                        self.bottom.clearSelection()
-                        new_items = []
-                        for text, icon, item_type in self.copied_items:
-                            new_item = QListWidgetItem(icon, text)
-                            new_item.setFlags(new_item.flags() | Qt.ItemFlag.ItemIsEditable)
-                            new_item.setData(Qt.ItemDataRole.UserRole, item_type)
-                            self.bottom.addItem(new_item)
-                            new_item.setSelected(True)
-                            new_items.append(new_item)
-                        if new_items:
-                            self.undo_stack.append(("add", new_items))
-                        if self.bottom.count() > 0:
-                            self.bottom.setCurrentItem(self.bottom.item(self.bottom.count() - 1))
+                    mimedata = QApplication.clipboard().mimeData()
+                    if mimedata is not None and mimedata.hasFormat(ASSETSMIMETYPE):
+                        records = decodeassets(bytes(mimedata.data(ASSETSMIMETYPE)))
+                        if records:
+                            self.pasteassets(records)
                     return True
                 
+                if event.key() == Qt.Key.Key_Backspace:
+                    self.openparentfolder()
+                    return True
+
                 if event.key() == Qt.Key.Key_Delete:
-                    selected_items = self.bottom.selectedItems()
-                    if selected_items:
-                        self.deleteitem(selected_items)  
-                    self.updatestatuslabel()
+                    selected_rows = self.selectedrows()
+                    if selected_rows:
+                        self.deleteitem(selected_rows)  
                     return True
 
                 
@@ -265,6 +4675,14 @@ class GameEditor(QMainWindow):
         return super().eventFilter(source, event)
 
     def openprojectsettings(self):
+        if self.settingswindow is not None:
+            self.iconsizeinput.setText(str(ICONSIZE))
+            self.undostepsinput.setText(str(self.history.maxentries))
+            self.undomemoryinput.setText(str(self.history.maxbytes // (1024 * 1024)))
+            self.settingswindow.show()
+            self.settingswindow.raise_()
+            return
+
         self.settingswindow = QWidget()
         self.settingswindow.setWindowTitle("Project Settings")
         self.settingswindow.setGeometry(200, 200, 400, 300)
@@ -277,10 +4695,27 @@ class GameEditor(QMainWindow):
 
         self.iconsizeinput = QLineEdit(str(ICONSIZE), self.settingswindow)
         self.iconsizeinput.setGeometry(100, 15, 200, 25)
-        self.iconsizeinput.setValidator(QIntValidator(1, 64))  
+        self.iconsizeinput.setValidator(QIntValidator(MINICONSIZE, MAXICONSIZE))  
 
-        # Update ICONSIZE when Enter pressed
+        # Update ICONSIZE as soon as the field holds a valid size, every size is pre-rendered
         self.iconsizeinput.returnPressed.connect(self.updateiconsize)
+        self.iconsizeinput.textEdited.connect(self.updateiconsize)
+
+        undostepslabel = QLabel("Undo Steps:", self.settingswindow)
+        undostepslabel.move(20, 60)
+
+        self.undostepsinput = QLineEdit(str(self.history.maxentries), self.settingswindow)
+        self.undostepsinput.setGeometry(100, 55, 200, 25)
+        self.undostepsinput.setValidator(QIntValidator(1, 1000000))
+        self.undostepsinput.editingFinished.connect(self.updateundolimits)
+
+        undomemorylabel = QLabel("Undo MB:", self.settingswindow)
+        undomemorylabel.move(20, 100)
+
+        self.undomemoryinput = QLineEdit(str(self.history.maxbytes // (1024 * 1024)), self.settingswindow)
+        self.undomemoryinput.setGeometry(100, 95, 200, 25)
+        self.undomemoryinput.setValidator(QIntValidator(1, 65536))
+        self.undomemoryinput.editingFinished.connect(self.updateundolimits)
 
         self.settingswindow.show()
 
@@ -288,49 +4723,113 @@ class GameEditor(QMainWindow):
     def updateiconsize(self):
         global ICONSIZE
         value = self.iconsizeinput.text()
-        if value.isdigit():
+        if value.isdigit() and MINICONSIZE <= int(value) <= MAXICONSIZE:
             ICONSIZE = int(value)
 
             self.bottom.setIconSize(QSize(ICONSIZE, ICONSIZE)) 
 
+    def updateundolimits(self):
+        steps = self.undostepsinput.text()
+        if steps.isdigit() and int(steps) > 0:
+            self.history.maxentries = int(steps)
+        memory = self.undomemoryinput.text()
+        if memory.isdigit() and int(memory) > 0:
+            self.history.maxbytes = int(memory) * 1024 * 1024
+        self.history.trim()
+
+    def buildcontextmenus(self):
+        self.itemmenu = QMenu(self)
+        self.openaction = QAction("Open", self)
+        self.openaction.triggered.connect(lambda: self.openitem(self.menuindex))
+        self.itemmenu.addAction(self.openaction)
+
+        self.runscriptaction = QAction("Run Script", self)
+        self.runscriptaction.triggered.connect(lambda: self.runscripts(
+            [self.assetmodel.assetid(row) for row in self.selectedrows()] or [self.assetmodel.assetid(self.menuindex.row())]))
+        self.itemmenu.addAction(self.runscriptaction)
+
+        self.placeaction = QAction("Place in Viewport", self)
+        self.placeaction.triggered.connect(lambda: self.placesprites(
+            [self.assetmodel.assetid(row) for row in self.selectedrows()] or [self.assetmodel.assetid(self.menuindex.row())]))
+        self.itemmenu.addAction(self.placeaction)
+
+        renameaction = QAction("Rename", self)
+        renameaction.triggered.connect(lambda: self.bottom.edit(self.menuindex))
+        self.itemmenu.addAction(renameaction)
+
+        deleteaction = QAction("Delete", self)
+        deleteaction.triggered.connect(lambda: self.deleteitem(self.menuindex.row()))
+        self.itemmenu.addAction(deleteaction)
+
+        self.moveupaction = QAction("Move to Parent Folder", self)
+        self.moveupaction.triggered.connect(lambda: self.reparentassets(
+            [self.assetmodel.assetid(row) for row in self.selectedrows()] or [self.assetmodel.assetid(self.menuindex.row())],
+            self.assets.parents[self.assetmodel.folder]))
+        self.itemmenu.addAction(self.moveupaction)
+
+        self.emptymenu = QMenu(self)
+        self.upaction = QAction("Up", self)
+        self.upaction.triggered.connect(self.openparentfolder)
+        self.emptymenu.addAction(self.upaction)
+
+        create_menu = self.emptymenu.addMenu("Create")
+        for assettype in ("Script", "Folder", "Material", "Audio", "Image"):
+            createaction = QAction(assettype, self)
+            createaction.triggered.connect(lambda checked=False, assettype=assettype: self.createasset(assettype, assettype))
+            create_menu.addAction(createaction)
+
     def showassetscontextmenu(self, pos):
-        item = self.bottom.itemAt(pos)
-        menu = QMenu()
-
-        if item: 
-            renameaction = QAction("Rename", self)
-            renameaction.triggered.connect(lambda: self.bottom.editItem(item))
-            menu.addAction(renameaction)
-
-            deleteaction = QAction("Delete", self)
-            deleteaction.triggered.connect(lambda: self.deleteitem(item))
-            menu.addAction(deleteaction)
-        else:  
-            create_menu = menu.addMenu("Create")
-            createscriptaction = QAction("Script", self)
-            createscriptaction.triggered.connect(lambda: self.createasset("Script", "Script"))
-            create_menu.addAction(createscriptaction)
-
-            createfolderaction = QAction("Folder", self)
-            createfolderaction.triggered.connect(lambda: self.createasset("Folder", "Folder"))
-            create_menu.addAction(createfolderaction)
-
-            createmataction = QAction("Material", self)
-            createmataction.triggered.connect(lambda: self.createasset("Material", "Material"))
-            create_menu.addAction(createmataction)
-
-            createaudioaction = QAction("Audio", self)
-            createaudioaction.triggered.connect(lambda: self.createasset("Audio", "Audio"))
-            create_menu.addAction(createaudioaction)
-
-            createimgaction = QAction("Image", self)
-            createimgaction.triggered.connect(lambda: self.createasset("Image", "Image"))
-            create_menu.addAction(createimgaction)
+        if self.itemmenu is None:
+            self.buildcontextmenus()  # built on first right click and reused after
+        index = self.bottom.indexAt(pos)
+        self.menuindex = index
+
+        if index.isValid():
+            menu = self.itemmenu
+            self.openaction.setVisible(self.assetmodel.tree.isfolder(self.assetmodel.assetid(index.row())))
+            self.runscriptaction.setVisible(self.assets.typeof(self.assetmodel.assetid(index.row())) == "Script")
+            self.placeaction.setVisible(self.assets.typeof(self.assetmodel.assetid(index.row())) == "Image")
+            self.moveupaction.setVisible(self.assetmodel.folder != ROOTFOLDER)
+        else:
+            menu = self.emptymenu
+            self.upaction.setVisible(self.assetmodel.folder != ROOTFOLDER)
 
         menu.exec(self.bottom.mapToGlobal(pos))
 
+    def buildinspector(self):
+        self.prop_name = QLineEdit()
+        self.prop_type = QLineEdit()
+        self.prop_type.setReadOnly(True)
+        self.prop_fileloc = QLineEdit()
+
+        self.namelabel = QLabel("Name:")
+        self.namelabel.setStyleSheet("border: none;")
+        self.type_label = QLabel("Type:")
+        self.type_label.setStyleSheet("border: none;")
+
+        self.rightlayout.addRow(self.namelabel, self.prop_name)
+        self.rightlayout.addRow(self.type_label, self.prop_type)
+
+        self.fileloc_row_index = self.rightlayout.rowCount()
+        self.rightlayout.addRow("File Location:", self.prop_fileloc)
+        self.prop_fileloc.hide()
+        self.prop_fileloc.editingFinished.connect(self.updatefilelocation)
+
+        self.prop_waveform = WaveformView()
+        self.rightlayout.addRow(self.prop_waveform)
+        self.prop_waveform.hide()
+
+        self.prop_name.editingFinished.connect(self.renamecurrentitem)
+
+    @profiled("GameEditor.updatepropertiespanel")
     def updatepropertiespanel(self):
-        selected = self.bottom.selectedItems()
+        selected = self.selectedrows()
+        if self.prop_name is None:
+            if len(selected) != 1:
+                self.nothingselectedlabel.setVisible(not selected)
+                self.multipleselectedlabel.setVisible(bool(selected))
+                return
+            self.buildinspector()
 
         namelabel = self.namelabel
         namefield = self.prop_name
@@ -348,6 +4847,8 @@ class GameEditor(QMainWindow):
             typefield.hide()
             filelabel.hide()
             filefield.hide()
+            self.prop_waveform.hide()
+            self.prop_waveform.setsource(None)
             self.prop_name.clear()
             self.prop_type.clear()
             self.prop_fileloc.clear()
@@ -363,9 +4864,9 @@ class GameEditor(QMainWindow):
         if shouldreturn:
             return
 
-        item = selected[0]
-        asset_type = item.data(Qt.ItemDataRole.UserRole)
-        asset_name = item.text()
+        assetid = self.assetmodel.assetid(selected[0])
+        asset_type = self.assets.typeof(assetid)
+        asset_name = self.assets.names[assetid]
 
         self.nothingselectedlabel.hide()
         self.multipleselectedlabel.hide()
@@ -376,8 +4877,8 @@ class GameEditor(QMainWindow):
         self.prop_name.setText(asset_name)
         self.prop_type.setText(asset_type)
 
-        if asset_type in ["Audio", "Image"]:
-            fileloc = item.data(Qt.ItemDataRole.UserRole + 1) or ""
+        if asset_type in FILEASSETTYPES:
+            fileloc = self.assets.filelocs[assetid] or ""
             self.prop_fileloc.setText(fileloc)
             filelabel.show()
             filefield.show()
@@ -386,114 +4887,325 @@ class GameEditor(QMainWindow):
             filelabel.hide()
             filefield.hide()
 
+        if asset_type == "Audio" and os.path.isfile(self.prop_fileloc.text()):
+            self.prop_waveform.setsource(self.prop_fileloc.text())
+            self.prop_waveform.show()
+        else:
+            self.prop_waveform.hide()
+            self.prop_waveform.setsource(None)
 
     def updatefilelocation(self):
-        selected = self.bottom.selectedItems()
+        selected = self.selectedrows()
         if not selected:
             return
-        item = selected[0]
-        item.setData(Qt.ItemDataRole.UserRole + 1, self.prop_fileloc.text())
+        index = self.assetmodel.index(selected[0])
+        self.assetmodel.setData(index, self.prop_fileloc.text(), Qt.ItemDataRole.UserRole + 1)
             
     def renamecurrentitem(self):
-        selected = self.bottom.selectedItems()
+        selected = self.selectedrows()
         if not selected:
             return
-        item = selected[0]
-        item.setText(self.prop_name.text())
-        self.updatepropertiespanel()
+        index = self.assetmodel.index(selected[0])
+        self.assetmodel.setData(index, self.prop_name.text())
+        self.refresh.markdirty("properties")
 
     def createasset(self, assettype, assetname):
-        items = []
-        if assettype == 'Folder':
-            foldericon = QIcon(str(folderimgassetpath))
-            item = QListWidgetItem(foldericon, assetname)
-            item.setData(Qt.ItemDataRole.UserRole, "Folder")
-            items.append(item)
-        elif assettype == 'Script':
-            scripticon = QIcon(str(scriptimgassetpath))
-            item = QListWidgetItem(scripticon, assetname)
-            item.setData(Qt.ItemDataRole.UserRole, "Script")
-            items.append(item)
-        elif assettype == 'Material':
-            maticon = QIcon(str(matimgassetpath))
-            item = QListWidgetItem(maticon, assetname)
-            item.setData(Qt.ItemDataRole.UserRole, "Material")
-            items.append(item)
-        elif assettype == 'Audio':
-            audicon = QIcon(str(audioimgassetpath))
-            item = QListWidgetItem(audicon, assetname)
-            item.setData(Qt.ItemDataRole.UserRole, "Audio")
-            item.setData(Qt.ItemDataRole.UserRole + 1, "")
-            items.append(item)
-        elif assettype == 'Image':
-            photoicon = QIcon(str(photoimgassetpath))
-            item = QListWidgetItem(photoicon, assetname)
-            item.setData(Qt.ItemDataRole.UserRole, "Image")
-            item.setData(Qt.ItemDataRole.UserRole + 1, "")
-            items.append(item)
-
-        for item in items:
-            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEditable)
-            self.bottom.addItem(item)
-
-        self.undo_stack.append(("add", items))
-        self.redo_stack.clear()
-        self.updatestatuslabel()
+        if assettype not in ASSETTYPES:
+            return
+        folder = self.assetmodel.folder
+        assetid = self.assets.add(assettype, assetname, parent=folder)
+        self.assetmodel.tree.created([assetid])
+        self.insertinto(folder, [assetid])
 
-    def deleteitem(self, items):
-        if not isinstance(items, list):
-            items = [items]
+        self.history.push("add", [(assetid, *self.assets.record(assetid))], folder)
 
-        deleted = [(i, self.bottom.row(i)) for i in items]
+    def insertinto(self, folderid, assetids):
+        # appends to a loaded folder, through the model when it is the one being shown
+        listing = self.assetmodel.tree.children[folderid]
+        entries = list(enumerate(assetids, len(listing)))
+        self.journalinsert(folderid, entries)
+        if folderid == self.assetmodel.folder:
+            self.assetmodel.insertassets(len(listing), assetids)
+        else:
+            self.assetmodel.tree.insert(folderid, entries)
 
-        for i, _ in reversed(deleted):
-            self.bottom.takeItem(self.bottom.row(i))
+    def copyassets(self, assetids):
+        records = [self.assets.record(assetid) for assetid in assetids]
+        mimedata = QMimeData()
+        mimedata.setData(ASSETSMIMETYPE, QByteArray(encodeassets(records)))
+        mimedata.setText("\n".join(name for _, name, _ in records))
+        QApplication.clipboard().setMimeData(mimedata)
 
-        self.undo_stack.append(("delete", deleted))
-        self.redo_stack.clear()
-        self.updatestatuslabel()
+    def pasteassets(self, records):
+        self.finishpaste()
+        self.bottom.clearSelection()
+        self.pasting = (records, 0, [])
+        if len(records) <= PASTECHUNKSIZE:
+            self.finishpaste()
+        else:
+            self.pastetimer.start(0)
+
+    @profiled("GameEditor.pastechunk")
+    def pastechunk(self):
+        records, offset, pasted = self.pasting
+        chunk = records[offset:offset + PASTECHUNKSIZE]
+        folder = self.assetmodel.folder
+        with self.bulkedit():
+            ids = self.assets.addrecords(chunk, folder)
+            self.assetmodel.tree.created(ids)
+            self.insertinto(folder, ids)
+            self.selectids(ids, atend=True)
+        pasted.extend(ids)
+        offset += len(chunk)
+        self.pasting = (records, offset, pasted)
+        if offset < len(records):
+            self.statusBar().showMessage(f"Pasting {offset} of {len(records)} asset(s)...")
+            return
+
+        self.pastetimer.stop()
+        self.pasting = None
+        self.history.push("add", [(assetid, *self.assets.record(assetid)) for assetid in pasted], self.assetmodel.folder)
+        if self.assetmodel.rowCount() > 0:
+            last = self.assetmodel.index(self.assetmodel.rowCount() - 1)
+            self.bottom.selectionModel().setCurrentIndex(last, QItemSelectionModel.SelectionFlag.NoUpdate)
+        if len(records) > PASTECHUNKSIZE:
+            self.statusBar().showMessage(f"Pasted {len(records)} asset(s)", 3000)
+
+    def finishpaste(self):
+        # runs what is left of an in-flight paste right away, so undo sees all of it
+        while self.pasting is not None:
+            self.pastechunk()
+
+    def removeassets(self, assetids):
+        # ids the history still refers to stay reserved so undo can restore them as they were
+        assetids = list(assetids)
+        if assetids:
+            self.journalchange("remove", assetids)
+        self.assetmodel.removeids(assetids)
+        self.assetmodel.tree.forget(assetids)
+        for assetid in assetids:
+            self.assetmodel.forgetthumbnail(assetid)
+            path = self.assets.filelocs[assetid]
+            if path and self.scannedids.get(path) == assetid:
+                del self.scannedids[path]  # the scanner no longer owns it, even if undo brings it back
+            self.assets.remove(assetid)
+            if not self.history.isreferenced(assetid):
+                self.assets.release(assetid)
+
+    @contextmanager
+    def bulkedit(self):
+        # panels stay put while rows churn and refresh once at the end; the view's per-row
+        # selection bookkeeping is skipped too, a single repaint covers it
+        selection = self.bottom.selectionModel()
+        blocked = selection.blockSignals(True)
+        try:
+            with self.refresh.suspend():
+                self.refresh.markdirty("status", "properties")
+                yield
+        finally:
+            selection.blockSignals(blocked)
+            self.bottom.viewport().update()
+
+    @profiled("GameEditor.deleteitem")
+    def deleteitem(self, rows):
+        if not isinstance(rows, list):
+            rows = [rows]
+        self.finishpaste()
 
+        ids = [self.assetmodel.assetid(row) for row in rows]
+        positions = self.assetmodel.positionsof(ids)
+        # a folder goes with everything below it, each recorded at its place in its own folder
+        tree = self.assetmodel.tree
+        folders = [assetid for assetid in ids if tree.isfolder(assetid)]
+        self.loadsubtree(folders)
+        positions.update(tree.descendants(folders))
+        deleted = sorted(((assetid, position, *self.assets.record(assetid)) for assetid, position in positions.items()),
+                         key=lambda record: record[1])
 
+        with self.bulkedit():
+            self.history.push("delete", [deleted], self.assetmodel.folder)
+            self.removeassets(list(positions))
+
+    def moveassets(self, assetids, position):
+        positions = self.assetmodel.positionsof(assetids)
+        with self.bulkedit():
+            target = self.assetmodel.moveids(assetids, position)
+            ordered = sorted(positions, key=positions.get)
+            moved = [(assetid, positions[assetid], target + offset) for offset, assetid in enumerate(ordered)]
+            if any(old != new for _, old, new in moved):
+                self.history.push("move", moved, self.assetmodel.folder)
+                self.journalchange("move", self.assetmodel.folder, [(new, assetid) for assetid, _, new in moved])
+            self.bottom.clearSelection()
+            self.selectids(assetids)
+
+    def reparentassets(self, assetids, folderid):
+        # moves assets of the shown folder into another one; a folder's subtree just comes along
+        tree = self.assetmodel.tree
+        assetids = [assetid for assetid in assetids if assetid != folderid and not tree.contains(assetid, folderid)]
+        if not assetids or folderid == self.assetmodel.folder:
+            return
+        self.loadfolder(folderid)
+        positions = self.assetmodel.positionsof(assetids)
+        start = len(tree.children[folderid])
+        ordered = sorted(positions, key=positions.get)
+        moved = [(assetid, positions[assetid], folderid, start + offset) for offset, assetid in enumerate(ordered)]
+        entries = [(new, assetid) for assetid, _, _, new in moved]
+        with self.bulkedit():
+            self.history.push("reparent", moved, self.assetmodel.folder)
+            self.journalchange("reparent", folderid, entries)
+            self.assetmodel.removeids(ordered)
+            tree.insert(folderid, entries)
+
+    def recordedit(self, assetid, role, old, new):
+        kind = "rename" if role == Qt.ItemDataRole.EditRole else "fileloc"
+        self.history.push(kind, [(assetid, old, new)], self.assetmodel.folder)
+        self.journalchange(kind, assetid, new)
+
+    def restoreassets(self, records):
+        # records: (id, position, typecode, name, fileloc) sorted by position, each put back in
+        # the folder it was taken from, folders before what was in them
+        tree = self.assetmodel.tree
+        for assetid, _, typecode, name, fileloc in records:
+            self.assets.restore(assetid, typecode, name, fileloc)
+        tree.created([record[0] for record in records])
+        byparent = {}
+        for assetid, position, *_ in records:
+            byparent.setdefault(self.assets.parents[assetid], []).append((position, assetid))
+        for parent, entries in byparent.items():
+            self.journalinsert(parent, entries)
+            if parent == self.assetmodel.folder:
+                self.assetmodel.insertatpositions(entries)
+            else:
+                tree.insert(parent, entries)
+
+    @profiled("GameEditor.undo")
     def undo(self):
-        if not self.undo_stack:
+        self.finishpaste()
+        command = self.history.undo()
+        if command is None:
             return
-        action = self.undo_stack.pop()
+        if command.kind not in ("rename", "fileloc"):
+            self.openfolder(command.folder)  # structural edits are undone where they were made
+
+        with self.bulkedit():
+            if command.kind == "add":
+                self.removeassets([record[0] for record in command.records])
 
-        if action[0] == "add":
-            for item in action[1]:
-                row = self.bottom.row(item)
-                self.bottom.takeItem(row)
-            self.redo_stack.append(action)
+            elif command.kind == "delete":
+                for group in reversed(command.records):
+                    self.restoreassets(group)
 
-        elif action[0] == "delete":
-            for item, row in action[1]:
-                self.bottom.insertItem(row, item)
-            self.redo_stack.append(action)
+            elif command.kind == "move":
+                moving = {record[0] for record in command.records}
+                rest = [assetid for assetid in self.assetmodel.listing if assetid not in moving]
+                entries = [(old, assetid) for assetid, old, _ in command.records]
+                self.journalchange("move", command.folder, entries)
+                self.assetmodel.relist(mergepositions(rest, entries))
 
-        self.updatestatuslabel()
+            elif command.kind == "reparent":
+                ids = [record[0] for record in command.records]
+                entries = [(old, assetid) for assetid, old, _, _ in command.records]
+                self.journalchange("reparent", command.folder, entries)
+                self.assetmodel.removeids(ids)
+                self.assetmodel.insertatpositions(entries)
 
+            elif command.kind in ("rename", "fileloc"):
+                role = Qt.ItemDataRole.EditRole if command.kind == "rename" else Qt.ItemDataRole.UserRole + 1
+                for assetid, old, _ in command.records:
+                    self.assetmodel.applyedit(assetid, role, old)
+                    self.journalchange(command.kind, assetid, old)
+
+    @profiled("GameEditor.redo")
     def redo(self):
-        if not self.redo_stack:
+        self.finishpaste()
+        command = self.history.redo()
+        if command is None:
             return
-        action = self.redo_stack.pop()
+        if command.kind not in ("rename", "fileloc"):
+            self.openfolder(command.folder)
+
+        with self.bulkedit():
+            if command.kind == "add":
+                for assetid, typecode, name, fileloc in command.records:
+                    self.assets.restore(assetid, typecode, name, fileloc)
+                ids = [record[0] for record in command.records]
+                self.assetmodel.tree.created(ids)
+                self.insertinto(command.folder, ids)
+
+            elif command.kind == "delete":
+                for group in command.records:
+                    self.removeassets([record[0] for record in group])
 
-        if action[0] == "add":
-            for item in action[1]:
-                self.bottom.addItem(item)
-            self.undo_stack.append(action)
+            elif command.kind == "move":
+                moving = {record[0] for record in command.records}
+                rest = [assetid for assetid in self.assetmodel.listing if assetid not in moving]
+                entries = [(new, assetid) for assetid, _, new in command.records]
+                self.journalchange("move", command.folder, entries)
+                self.assetmodel.relist(mergepositions(rest, entries))
 
-        elif action[0] == "delete":
-            for item, _ in action[1]:
-                row = self.bottom.row(item)
-                self.bottom.takeItem(row)
-            self.undo_stack.append(action)
+            elif command.kind == "reparent":
+                ids = [record[0] for record in command.records]
+                folderid = command.records[0][2]
+                entries = [(new, assetid) for assetid, _, _, new in command.records]
+                self.journalchange("reparent", folderid, entries)
+                self.assetmodel.removeids(ids)
+                self.assetmodel.tree.insert(folderid, entries)
 
-        self.updatestatuslabel()
+            elif command.kind in ("rename", "fileloc"):
+                role = Qt.ItemDataRole.EditRole if command.kind == "rename" else Qt.ItemDataRole.UserRole + 1
+                for assetid, _, new in command.records:
+                    self.assetmodel.applyedit(assetid, role, new)
+                    self.journalchange(command.kind, assetid, new)
+
+def reportstartup(marks, budgetms=STARTUPBUDGETMS):
+    # marks are (stage, perf_counter) in order, each stage is timed from the one before
+    previous = STARTUPTIME
+    lines = ["startup:"]
+    for stage, stamp in marks:
+        lines.append(f"  {stage:<16}{(stamp - previous) * 1000:8.1f} ms")
+        previous = stamp
+    total = (previous - STARTUPTIME) * 1000
+    verdict = "ok" if total <= budgetms else "over budget"
+    lines.append(f"  {'first frame':<16}{total:8.1f} ms  (budget {budgetms} ms, {verdict})")
+    print("\n".join(lines), file=sys.stderr)
+    return total <= budgetms
 
 if __name__ == "__main__":
+    profile = "--profile-startup" in sys.argv
+    if profile:
+        sys.argv.remove("--profile-startup")
+    tracepath = None  # --trace PATH records from launch and writes the trace on exit
+    if "--trace" in sys.argv[:-1]:
+        position = sys.argv.index("--trace")
+        tracepath = sys.argv[position + 1]
+        del sys.argv[position:position + 2]
+        PROFILER.start()
+    marks = [("import", time.perf_counter())]
+
     app = QApplication(sys.argv)
+    marks.append(("qapplication", time.perf_counter()))
     window = GameEditor()
+    window.traceaction.setChecked(PROFILER.enabled)
+    marks.append(("construction", time.perf_counter()))
+
+    if profile:
+        def firstframe():
+            marks.append(("first paint", time.perf_counter()))
+            app.exit(0 if reportstartup(marks) else 1)
+        window.viewport.firstpaint = firstframe
+        # A window that never paints counts as a failed start rather than a hang
+        QTimer.singleShot(STARTUPBUDGETMS * 10, lambda: (print("startup: no frame painted", file=sys.stderr), app.exit(1)))
 
     window.showMaximized()
 
-    sys.exit(app.exec())
+    if len(sys.argv) > 1 and os.path.isdir(sys.argv[1]):
+        window.openprojectfolder(sys.argv[1])
+    elif len(sys.argv) > 1 and sys.argv[1].endswith(PROJECTEXTENSION):
+        window.openproject(sys.argv[1])
+    if profile:
+        marks.append(("show", time.perf_counter()))
+
+    code = app.exec()
+    if tracepath:
+        PROFILER.export(tracepath)
+    sys.exit(code)